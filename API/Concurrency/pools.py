@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Pool sizes can be tuned per host through environment variables.
+# The inference pool should be at least as large as INFERENCE_MAX_BATCH_SIZE so the
+# batch scheduler has enough concurrent callers to fill a batch.
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "8"))
+INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", "16"))
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "16"))
+IO_QUEUE_LIMIT = int(os.getenv("IO_QUEUE_LIMIT", "64"))
+
+
+class PoolSaturatedError(Exception):
+    """
+    Raised when a pool already has as many running and queued tasks as it allows.
+    The API turns this into a 503 so clients can back off and retry.
+    """
+
+    def __init__(self, pool_name: str):
+        super().__init__(f"The {pool_name} pool is at capacity, please retry later")
+        self.pool_name = pool_name
+
+
+class BoundedPool:
+    """
+    A thread pool that accepts at most max_workers running plus max_pending queued tasks.
+    Blocking functions are run with `await pool.run(fn, *args)` so the event loop stays free.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Submit fn to the pool and return a concurrent.futures.Future.
+        Raises PoolSaturatedError instead of queueing without bound.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturatedError(self.name)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+        # The slot is held until the task itself finishes, even if the awaiting request is cancelled
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# CPU-bound work: decoding, preprocessing and waiting on the batch scheduler
+inference_pool = BoundedPool("inference", INFERENCE_POOL_SIZE, INFERENCE_QUEUE_LIMIT)
+
+# Blocking I/O: the Cloudinary SDK, HTTP downloads and file writes
+io_pool = BoundedPool("io", IO_POOL_SIZE, IO_QUEUE_LIMIT)
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await inference_pool.run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+def pool_stats() -> dict:
+    return {
+        "inference": inference_pool.stats(),
+        "io": io_pool.stats(),
+    }
+
+
+def shutdown_pools(wait: bool = True):
+    inference_pool.shutdown(wait=wait)
+    io_pool.shutdown(wait=wait)
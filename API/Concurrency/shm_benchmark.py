@@ -0,0 +1,142 @@
+"""
+Measures the cost of handing frames to inference processes and getting predictions back, without the
+model: the worker processes only normalize the frames they receive, so the numbers are transport overhead.
+
+  - "queue pickling": normalized float32 batches go to the workers through a multiprocessing.Queue and
+    the float32 predictions come back the same way, pickled both ways.
+  - "shared ring": uint8 frames are written into FrameRing slots, only slot indices go through the
+    queues, and the workers write float32 predictions back into the slots in place.
+
+Both sides keep at most --slots frames in flight, so producers are throttled (backpressure) instead of
+queueing without bound.
+
+    python API/Concurrency/shm_benchmark.py [--frames 2000] [--workers 2] [--batch-size 8] [--slots 32]
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Concurrency.shm_ring import FrameRing, FRAME_SHAPE
+
+
+def queue_worker(tasks, results):
+    while True:
+        batch = tasks.get()
+        if batch is None:
+            break
+        results.put(batch * np.float32(1.0))
+
+
+def ring_worker(ring_name: str, slots: int, tasks, results):
+    ring = FrameRing.attach(ring_name, slots)
+    while True:
+        indices = tasks.get()
+        if indices is None:
+            break
+        ring.write_outputs(indices, ring.frames(indices).astype(np.float32) / 255.0)
+        results.put(indices)
+    ring.close()
+
+
+def source_frames(count: int) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, size=(count,) + FRAME_SHAPE, dtype=np.uint8)
+
+
+def run_queue(context, frames: np.ndarray, total: int, workers: int, batch_size: int, slots: int) -> float:
+    tasks = context.Queue(maxsize=max(1, slots // batch_size))
+    results = context.Queue()
+    processes = [context.Process(target=queue_worker, args=(tasks, results), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    batches = -(-total // batch_size)
+    checksum = [0.0]
+
+    def collect():
+        for _ in range(batches):
+            checksum[0] += float(results.get()[0, 0, 0, 0])
+
+    collector = threading.Thread(target=collect)
+    start = time.perf_counter()
+    collector.start()
+    for b in range(batches):
+        batch = frames[(b * batch_size) % len(frames):][:batch_size]
+        # What the API does today: normalize in process, then the batch is pickled to the worker
+        tasks.put(batch.astype(np.float32) / 255.0)
+    collector.join()
+    elapsed = time.perf_counter() - start
+    for _ in processes:
+        tasks.put(None)
+    for process in processes:
+        process.join()
+    return elapsed
+
+
+def run_ring(context, frames: np.ndarray, total: int, workers: int, batch_size: int, slots: int):
+    ring = FrameRing(max(slots, batch_size))
+    tasks = context.Queue()
+    results = context.Queue()
+    processes = [context.Process(target=ring_worker, args=(ring.name, ring.slots, tasks, results), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    batches = -(-total // batch_size)
+    checksum = [0.0]
+
+    def collect():
+        for _ in range(batches):
+            indices = results.get()
+            # Predictions are read in place, then the slots are recycled
+            checksum[0] += float(ring.outputs[indices[0], 0, 0, 0])
+            for index in indices:
+                ring.release(index)
+
+    collector = threading.Thread(target=collect)
+    start = time.perf_counter()
+    collector.start()
+    for b in range(batches):
+        batch = frames[(b * batch_size) % len(frames):][:batch_size]
+        indices = []
+        for frame in batch:
+            slot = ring.acquire()
+            slot.input[...] = frame
+            indices.append(slot.index)
+        tasks.put(indices)
+    collector.join()
+    elapsed = time.perf_counter() - start
+    for _ in processes:
+        tasks.put(None)
+    for process in processes:
+        process.join()
+    stats = ring.stats()
+    ring.close()
+    return elapsed, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark shared-memory frame handoff against queue pickling")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--slots", type=int, default=32, help="Frames in flight at most")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    frames = source_frames(64)
+    frame_bytes = int(np.prod(FRAME_SHAPE))
+    print(f"{args.frames} frames of {FRAME_SHAPE}, {args.workers} workers, batches of {args.batch_size}, "
+          f"{args.slots} frames in flight")
+    print(f"{'Transport':<16} {'frames/s':>10} {'MB/s handed over':>17} {'slot waits':>11}")
+
+    elapsed = run_queue(context, frames, args.frames, args.workers, args.batch_size, args.slots)
+    moved = args.frames * frame_bytes * 8 / elapsed / 1e6  # float32 in and out
+    print(f"{'queue pickling':<16} {args.frames / elapsed:>10.1f} {moved:>17.1f} {'-':>11}")
+
+    elapsed, stats = run_ring(context, frames, args.frames, args.workers, args.batch_size, args.slots)
+    moved = args.frames * frame_bytes * 5 / elapsed / 1e6  # uint8 in, float32 out
+    print(f"{'shared ring':<16} {args.frames / elapsed:>10.1f} {moved:>17.1f} {stats['waits']:>11}")
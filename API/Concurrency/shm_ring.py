@@ -0,0 +1,183 @@
+"""
+A ring of fixed-size frame slots in one multiprocessing.shared_memory segment, for handing images
+between the API process and the inference workers without pickling them.
+
+Each slot holds one uint8 input frame and one float32 prediction of the same shape. The owning
+(API) process acquires a free slot, writes the decoded frame into slot.input, and sends only the
+slot index to a worker. The worker reads the frames in place and writes its predictions into
+slot.output, which the API reads through a NumPy view before releasing the slot for reuse.
+When every slot is taken, acquire() waits up to a timeout and then raises RingFullError,
+which the API turns into a 503 like a saturated pool.
+
+shm_benchmark.py compares the ring with pickling frames through a multiprocessing queue.
+"""
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Concurrency.pools import PoolSaturatedError
+except ImportError:
+    try:
+        # Try relative import
+        from .pools import PoolSaturatedError
+    except ImportError:
+        # Direct import when run from the Concurrency directory
+        from pools import PoolSaturatedError
+
+
+FRAME_SHAPE = (256, 256, 3)
+
+
+class RingFullError(PoolSaturatedError):
+    """
+    Raised when no slot frees up within the acquire timeout.
+    """
+
+    def __init__(self):
+        super().__init__("frame ring")
+
+
+class FrameSlot:
+    """
+    One acquired slot. `input` and `output` are views into shared memory, valid until release().
+    `owner` is whatever runs the slot's frame through the model (see InferenceWorkerPool.run_slots).
+    Usable as a context manager that releases the slot on exit.
+    """
+    __slots__ = ("ring", "index", "owner", "input", "output")
+
+    def __init__(self, ring: "FrameRing", index: int, owner=None):
+        self.ring = ring
+        self.index = index
+        self.owner = owner
+        self.input = ring.inputs[index]
+        self.output = ring.outputs[index]
+
+    def release(self):
+        if self.ring is not None:
+            ring, self.ring = self.ring, None
+            self.input = self.output = None
+            ring.release(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameRing:
+    """
+    `slots` input/output frame pairs in one shared-memory segment.
+    Created by the owning process (create=True); workers attach to it by name.
+    Only the owner hands out slots: free slot indices are recycled through an in-process queue.
+    """
+
+    def __init__(self, slots: int, frame_shape: Tuple[int, ...] = FRAME_SHAPE, name: Optional[str] = None,
+                 create: bool = True):
+        self.slots = max(1, slots)
+        self.frame_shape = tuple(frame_shape)
+        input_bytes = self.slots * int(np.prod(self.frame_shape))
+        size = input_bytes * (1 + np.dtype(np.float32).itemsize)
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.inputs = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.outputs = np.ndarray((self.slots,) + self.frame_shape, dtype=np.float32, buffer=self.shm.buf,
+                                  offset=input_bytes)
+        self._free = queue.Queue()
+        for index in range(self.slots if create else 0):
+            self._free.put(index)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._waits = 0
+        self._rejected = 0
+
+    @classmethod
+    def attach(cls, name: str, slots: int, frame_shape: Tuple[int, ...] = FRAME_SHAPE) -> "FrameRing":
+        return cls(slots, frame_shape, name=name, create=False)
+
+    def acquire(self, timeout: Optional[float] = None, owner=None) -> FrameSlot:
+        """
+        Take a free slot, waiting up to timeout seconds (forever if None) for one to be released.
+        """
+        try:
+            index = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._waits += 1
+            try:
+                index = self._free.get(timeout=timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._rejected += 1
+                raise RingFullError()
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return FrameSlot(self, index, owner)
+
+    def release(self, index: int):
+        with self._lock:
+            self._in_use -= 1
+        self._free.put(index)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every slot has been released, taking them all so none can be acquired meanwhile.
+        Returns False (and puts them back) if that didn't happen within timeout.
+        """
+        taken = []
+        try:
+            for _ in range(self.slots):
+                taken.append(self._free.get(timeout=timeout))
+            return True
+        except queue.Empty:
+            return False
+        finally:
+            for index in taken:
+                self._free.put(index)
+
+    def frames(self, indices: List[int]) -> np.ndarray:
+        """
+        The input frames of the given slots; a view without copying when the indices are consecutive.
+        """
+        return self.inputs[self._selector(indices)]
+
+    def write_outputs(self, indices: List[int], predictions: np.ndarray):
+        self.outputs[self._selector(indices)] = predictions
+
+    @staticmethod
+    def _selector(indices: List[int]):
+        first = indices[0]
+        if list(indices) == list(range(first, first + len(indices))):
+            return slice(first, first + len(indices))
+        return list(indices)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "waits": self._waits,
+                "rejected": self._rejected,
+            }
+
+    def close(self):
+        """
+        Drop this process's mapping; the owner also frees the segment.
+        """
+        self.inputs = self.outputs = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A prediction view is still referenced somewhere; the mapping goes away with it
+            pass
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,207 @@
+import asyncio
+import traceback
+from typing import List, Optional
+from pymongo import AsyncMongoClient, ReturnDocument
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Database.serialization import serialize_document
+    from API.Database import config, queries
+except ImportError:
+    try:
+        # Try relative import
+        from .serialization import serialize_document
+        from . import config, queries
+    except ImportError:
+        # Direct import when run from the Database directory
+        from serialization import serialize_document
+        import config
+        import queries
+
+
+class AsyncImageRepository:
+    """
+    Async data layer for the images collection, used by the FastAPI handlers.
+    Mirrors the helpers in database.py (which remain as the sync facade for scripts), but awaits
+    the driver instead of blocking a thread per query. Both build their commands with queries.py.
+    connect()/close() are tied to the application's startup and shutdown; pool size and timeouts
+    come from config.py.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self.collection = None
+        self._connect_lock = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.collection is not None
+
+    async def _open(self, connection_string: str, local: bool = False):
+        client = AsyncMongoClient(connection_string, **config.client_options(local=local))
+        try:
+            await client.admin.command('ping')
+        except Exception:
+            await client.close()
+            raise
+        return client
+
+    async def connect(self):
+        if self.is_connected:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if not self.is_connected:
+                await self._connect()
+
+    async def _connect(self):
+        try:
+            print(f"Connecting to MongoDB Atlas (password masked): {config.masked(config.CONNECTION_STRING)}")
+            self.client = await self._open(config.CONNECTION_STRING)
+            print("MongoDB Atlas connection successful")
+        except Exception as e:
+            print(f"Error connecting to MongoDB Atlas: {str(e)}")
+            print("Falling back to local MongoDB server...")
+            try:
+                print(f"Connecting to local MongoDB: {config.LOCAL_CONNECTION_STRING}")
+                self.client = await self._open(config.LOCAL_CONNECTION_STRING, local=True)
+                print("Connected to local MongoDB server")
+            except Exception as e_local:
+                print(f"Error connecting to local MongoDB: {str(e_local)}")
+                print(config.CONNECTION_FAILED_MESSAGE)
+                raise Exception("Failed to connect to any MongoDB server (Atlas or local)") from e
+        self.db = self.client[config.DATABASE_NAME]
+        self.collection = self.db[config.COLLECTION_NAME]
+        print(f"Using database: {self.db.name}, collection: {self.collection.name} "
+              f"(pool {config.MONGO_MIN_POOL_SIZE}-{config.MONGO_MAX_POOL_SIZE})")
+
+    async def _get_collection(self):
+        # Connects on first use if startup hasn't finished connecting yet
+        if not self.is_connected:
+            await self.connect()
+        return self.collection
+
+    async def get_jobs_collection(self):
+        await self._get_collection()
+        return self.db[config.JOBS_COLLECTION_NAME]
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self.db = None
+        self.collection = None
+
+    async def ensure_indexes(self):
+        try:
+            collection = await self._get_collection()
+            for keys, name in queries.INDEXES:
+                await collection.create_index(keys, name=name)
+            print("MongoDB indexes are in place")
+        except Exception as e:
+            print(f"Error in ensure_indexes: {str(e)}")
+            traceback.print_exc()
+
+    async def get_images_page(self, limit: int = 100, after: Optional[str] = None,
+                              fields: Optional[List[str]] = None, colorized: Optional[bool] = None):
+        try:
+            query = queries.page_query(after, colorized)
+            collection = await self._get_collection()
+            cursor = collection.find(query, queries.projection(fields)).sort(queries.PAGE_SORT).limit(
+                queries.page_fetch_limit(limit))
+            images = [serialize_document(image) async for image in cursor]
+            images, next_cursor = queries.split_page(images, limit)
+            print(f"Retrieved {len(images)} images from database")
+            return images, next_cursor
+        except Exception as e:
+            print(f"Error in get_images_page: {str(e)}")
+            traceback.print_exc()
+            return [], None
+
+    async def find_images(self, query: dict, fields: Optional[List[str]] = None, limit: int = 0):
+        try:
+            collection = await self._get_collection()
+            images = [serialize_document(image) async for image in collection.find(query, queries.projection(fields)).limit(limit)]
+            print(f"Found {len(images)} images matching {query}")
+            return images
+        except Exception as e:
+            print(f"Error in find_images: {str(e)}")
+            traceback.print_exc()
+            return []
+
+    async def get_image_by_id(self, image_id: str):
+        try:
+            collection = await self._get_collection()
+            image = await collection.find_one(queries.by_id(image_id))
+            if image:
+                print(f"Retrieved image with ID {image_id}")
+                return serialize_document(image)
+            print(f"Image with ID {image_id} not found")
+            return None
+        except Exception as e:
+            print(f"Error in get_image_by_id: {str(e)}")
+            traceback.print_exc()
+            return None
+
+    async def create_image(self, image_data: dict):
+        try:
+            print(f"Inserting image data: {image_data}")
+            collection = await self._get_collection()
+            result = await collection.insert_one(image_data)
+            print(f"Insert result: {result.inserted_id}")
+            image_data["_id"] = result.inserted_id
+            return serialize_document(image_data)
+        except Exception as e:
+            print(f"Error in create_image: {str(e)}")
+            traceback.print_exc()
+            return None
+
+    async def update_image(self, image_id: str, image_data: dict):
+        try:
+            print(f"Updating image with ID {image_id}, data: {image_data}")
+            collection = await self._get_collection()
+            updated_image = await collection.find_one_and_update(
+                queries.by_id(image_id),
+                queries.set_fields(image_data),
+                return_document=ReturnDocument.AFTER,
+            )
+            return serialize_document(updated_image) if updated_image else None
+        except Exception as e:
+            print(f"Error in update_image: {str(e)}")
+            traceback.print_exc()
+            return None
+
+    async def update_images(self, updates: dict):
+        if not updates:
+            return 0
+        try:
+            print(f"Updating {len(updates)} images in one batch")
+            collection = await self._get_collection()
+            result = await collection.bulk_write(
+                queries.bulk_updates(updates),
+                ordered=False,
+            )
+            print(f"Bulk update result: {result.modified_count} document(s) modified")
+            return result.modified_count
+        except Exception as e:
+            print(f"Error in update_images: {str(e)}")
+            traceback.print_exc()
+            return 0
+
+    async def delete_image(self, image_id: str):
+        try:
+            print(f"Deleting image with ID {image_id}")
+            collection = await self._get_collection()
+            deleted_image = await collection.find_one_and_delete(queries.by_id(image_id))
+            print(f"Delete result: {1 if deleted_image else 0} document(s) deleted")
+            return serialize_document(deleted_image) if deleted_image else None
+        except Exception as e:
+            print(f"Error in delete_image: {str(e)}")
+            traceback.print_exc()
+            return None
+
+
+repository = AsyncImageRepository()
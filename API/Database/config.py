@@ -0,0 +1,61 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Get MongoDB Atlas credentials from environment variables
+ATLAS_PASSWORD = os.getenv("ATLAS_PASSWORD")
+ATLAS_USERNAME = os.getenv("ATLAS_USERNAME", "admin")
+ATLAS_CLUSTER = os.getenv("ATLAS_CLUSTER", "cluster0.mongodb.net")
+ATLAS_DB_NAME = os.getenv("ATLAS_DB_NAME", "image_colorization_db")
+
+CONNECTION_STRING = f"mongodb+srv://{ATLAS_USERNAME}:{ATLAS_PASSWORD}@{ATLAS_CLUSTER}/?retryWrites=true&w=majority&appName={ATLAS_DB_NAME}"
+LOCAL_CONNECTION_STRING = os.getenv("LOCAL_MONGO_URI", "mongodb://localhost:27017/")
+DATABASE_NAME = "image_colorization_db"
+COLLECTION_NAME = "images"
+JOBS_COLLECTION_NAME = "jobs"
+
+# Connection pool and timeout settings, shared by the sync and async clients
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+MONGO_LOCAL_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_LOCAL_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+
+
+def masked(connection_string: str) -> str:
+    return connection_string.replace(ATLAS_PASSWORD, '*****') if ATLAS_PASSWORD else connection_string
+
+
+def client_options(local: bool = False) -> dict:
+    """
+    Keyword arguments for MongoClient / AsyncMongoClient.
+    """
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_LOCAL_SERVER_SELECTION_TIMEOUT_MS if local else MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+
+CONNECTION_FAILED_MESSAGE = """
+================================================================================
+MONGODB CONNECTION FAILED
+--------------------------------------------------------------------------------
+Please ensure either:
+1. Your internet connection is working for MongoDB Atlas, or
+2. You have a local MongoDB server running
+
+If you need to install MongoDB locally:
+- Windows: https://www.mongodb.com/try/download/community
+- Connect using the URI: mongodb://localhost:27017
+================================================================================
+"""
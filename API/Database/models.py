@@ -0,0 +1,21 @@
+from typing import Optional
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+# Pydantic models for data validation
+class ImageBase(BaseModel):
+    title: str
+    description: Optional[str] = None
+    cloudinary_url: str
+    colorized: bool = False
+    colorized_cloudinary_url: Optional[str] = None
+    
+class ImageCreate(ImageBase):
+    pass
+
+class ImageResponse(ImageBase):
+    id: str = Field(..., alias="_id")
+    
+    class Config:
+        populate_by_name = True
+        json_encoders = {ObjectId: str}
@@ -0,0 +1,58 @@
+"""
+Query, projection and update documents for the images collection.
+Shared by the sync helpers in database.py and the async repository in async_repository.py,
+so both send exactly the same commands and only differ in how they await the driver.
+"""
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+
+# Keyset pagination filtered by colorized status walks this index in _id order
+INDEXES = [([("colorized", ASCENDING), ("_id", ASCENDING)], "colorized_id")]
+
+# Listing order for keyset pagination
+PAGE_SORT = [("_id", ASCENDING)]
+
+
+def projection(fields: Optional[List[str]]) -> Optional[dict]:
+    return {field: 1 for field in fields} if fields else None
+
+
+def by_id(image_id: str) -> dict:
+    return {"_id": ObjectId(image_id)}
+
+
+def page_query(after: Optional[str] = None, colorized: Optional[bool] = None) -> dict:
+    """
+    Filter for the page after the image `after`, optionally limited to one colorization status.
+    """
+    query = {}
+    if colorized is not None:
+        query["colorized"] = colorized
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    return query
+
+
+def page_fetch_limit(limit: int) -> int:
+    # Fetch one extra document to know whether there is a next page
+    return limit + 1
+
+
+def split_page(images: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    Split the documents fetched with page_fetch_limit into the page and the cursor of the next one.
+    """
+    next_cursor = images[limit - 1]["_id"] if len(images) > limit else None
+    return images[:limit], next_cursor
+
+
+def set_fields(image_data: dict) -> dict:
+    return {"$set": image_data}
+
+
+def bulk_updates(updates: Dict[str, dict]) -> List[UpdateOne]:
+    """
+    One UpdateOne per {image_id: image_data} entry, for a single unordered bulk_write.
+    """
+    return [UpdateOne(by_id(image_id), set_fields(image_data)) for image_id, image_data in updates.items()]
@@ -0,0 +1,107 @@
+"""
+Counts the MongoDB round-trips each API endpoint makes on the images collection.
+
+Drives the real FastAPI app through TestClient, with the async repository's collection (the one the
+handlers use) wrapped in a counter. Needs a reachable MongoDB (Atlas, or the local fallback the API
+uses) and httpx for TestClient. Images are stored with the disk backend in a temporary directory
+unless STORAGE_BACKEND is set:
+
+    python API/Database/roundtrip_check.py
+
+Exits with a non-zero status if any endpoint makes more round-trips than expected.
+"""
+import io
+import os
+import sys
+import tempfile
+
+# Collection methods that each cost one request/response with the server
+ROUND_TRIP_METHODS = {
+    "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete",
+    "find_one_and_replace", "bulk_write", "count_documents", "aggregate", "find",
+}
+
+
+class CountingCollection:
+    """
+    Wraps a pymongo collection (sync or async) and counts calls that hit the server.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name in ROUND_TRIP_METHODS and callable(attribute):
+            def counted(*args, **kwargs):
+                self.calls.append(name)
+                return attribute(*args, **kwargs)
+            return counted
+        return attribute
+
+    def reset(self):
+        self.calls = []
+
+
+def load_app():
+    if "STORAGE_BACKEND" not in os.environ:
+        os.environ["STORAGE_BACKEND"] = "disk"
+        os.environ["STORAGE_DIR"] = tempfile.mkdtemp(prefix="roundtrip_storage_")
+    # main.py is run from the API directory
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    return main
+
+
+def sample_jpeg() -> bytes:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (120, 120, 120)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def run_checks(main) -> bool:
+    from fastapi.testclient import TestClient
+
+    ok = True
+    with TestClient(main.app) as client:
+        # Connect in the app's event loop, then count on the collection the handlers query
+        client.portal.call(main.repository.connect)
+        counter = CountingCollection(main.repository.collection)
+        main.repository.collection = counter
+
+        def check(operation: str, expected: int, request, status: int):
+            nonlocal ok
+            counter.reset()
+            response = request()
+            passed = len(counter.calls) <= expected and response.status_code == status
+            ok = ok and passed
+            result = "ok" if passed else ("TOO MANY" if len(counter.calls) > expected else f"HTTP {response.status_code}")
+            print(f"{operation:<36} {len(counter.calls)} round-trip(s) (expected {expected}): "
+                  f"{', '.join(counter.calls)} [{result}]")
+            return response
+
+        missing_id = "0" * 24
+        created = check("POST /upload-image", 1, lambda: client.post(
+            "/upload-image", data={"title": "roundtrip"},
+            files={"file": ("roundtrip.jpg", sample_jpeg(), "image/jpeg")}), 201).json()
+        image_id = created.get("_id", missing_id)
+        check("GET /images", 1, lambda: client.get("/images", params={"limit": 10}), 200)
+        check("GET /images/{id}", 1, lambda: client.get(f"/images/{image_id}"), 200)
+        check("PUT /images/{id}", 1, lambda: client.put(f"/images/{image_id}", json={"title": "renamed"}), 200)
+        check("PUT /images/{id} (missing)", 1, lambda: client.put(f"/images/{missing_id}", json={"title": "renamed"}), 404)
+        check("PUT /images/{id}/colorize", 1, lambda: client.put(
+            f"/images/{image_id}/colorize",
+            files={"colorized_image": ("colorized.jpg", sample_jpeg(), "image/jpeg")}), 200)
+        # Unknown IDs are reported from the lookup alone; nothing is left to write
+        check("POST /images/colorize/bulk (missing)", 1, lambda: client.post(
+            "/images/colorize/bulk", json={"ids": [missing_id]}), 200)
+        check("DELETE /images/{id}", 1, lambda: client.delete(f"/images/{image_id}"), 200)
+        check("DELETE /images/{id} (missing)", 1, lambda: client.delete(f"/images/{image_id}"), 404)
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_checks(load_app()) else 1)
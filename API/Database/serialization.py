@@ -0,0 +1,19 @@
+from bson import ObjectId
+
+
+def _serialize_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return serialize_document(value)
+    if isinstance(value, list):
+        return [_serialize_value(v) for v in value]
+    return value
+
+
+def serialize_document(document: dict) -> dict:
+    """
+    Convert a pymongo document into a JSON-ready dict in a single pass.
+    ObjectId values become strings directly instead of going through json.dumps/json.loads.
+    """
+    return {key: _serialize_value(value) for key, value in document.items()}
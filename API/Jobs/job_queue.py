@@ -0,0 +1,279 @@
+import asyncio
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from pymongo import ASCENDING, ReturnDocument
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Database.serialization import serialize_document
+except ImportError:
+    try:
+        # Try relative import
+        from ..Database.serialization import serialize_document
+    except (ImportError, ValueError):
+        # Direct import when run from the API directory
+        from Database.serialization import serialize_document
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+# Longest a job waits between tries while the server is saturated
+JOB_DEFER_MAX_SECONDS = float(os.getenv("JOB_DEFER_MAX_SECONDS", "30"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+# A running job whose worker hasn't renewed its lease in this long is assumed lost and picked up again
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+# How often a worker renews the lease of the job it is running
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_TIMEOUT_SECONDS / 3)))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+DEAD_LETTER = "dead_letter"
+TERMINAL_STATES = (COMPLETED, DEAD_LETTER)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Durable job queue stored in the Mongo `jobs` collection and processed by a pool of asyncio workers.
+
+    Jobs are claimed with an atomic find_one_and_update, so several API processes can share the queue.
+    Each claim takes a lease that the worker renews (heartbeat_at) while the handler runs; a job whose
+    lease expired is picked up again, or dead-lettered if it has used all its attempts. Results are only
+    recorded by the holder of the current lease, so a worker that lost its job can't overwrite another's.
+    A failed job is retried with exponential backoff until max_attempts is reached, then moved to the
+    dead_letter state. Errors listed in permanent_errors skip the retries; errors listed in
+    transient_errors (a saturated server) requeue the job with a backoff without using up an attempt.
+    Handlers are async callables registered per job type; they receive the job payload and return
+    a JSON-serializable result.
+    """
+
+    def __init__(self, repository, workers: int = JOB_WORKERS, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 permanent_errors: tuple = (LookupError, ValueError), transient_errors: tuple = ()):
+        self.repository = repository
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.permanent_errors = permanent_errors
+        self.transient_errors = transient_errors
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._stopping = False
+        self._indexes_ready = False
+
+    def register(self, job_type: str, handler):
+        self._handlers[job_type] = handler
+
+    async def ensure_indexes(self) -> bool:
+        try:
+            collection = await self.repository.get_jobs_collection()
+            await collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at")
+            self._indexes_ready = True
+        except Exception as e:
+            print(f"Error in JobQueue.ensure_indexes: {str(e)}")
+            traceback.print_exc()
+        return self._indexes_ready
+
+    async def enqueue(self, job_type: str, payload: dict) -> dict:
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        now = _now()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "type": job_type,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "available_at": now,
+        }
+        collection = await self.repository.get_jobs_collection()
+        await collection.insert_one(job)
+        print(f"Enqueued {job_type} job {job['_id']}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return serialize_document(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        collection = await self.repository.get_jobs_collection()
+        job = await collection.find_one({"_id": job_id})
+        return serialize_document(job) if job else None
+
+    async def retry(self, job_id: str) -> Optional[dict]:
+        """
+        Put a dead-lettered job back in the queue with a fresh set of attempts.
+        """
+        collection = await self.repository.get_jobs_collection()
+        now = _now()
+        job = await collection.find_one_and_update(
+            {"_id": job_id, "status": DEAD_LETTER},
+            {"$set": {"status": QUEUED, "attempts": 0, "error": None, "available_at": now, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job and self._wakeup is not None:
+            self._wakeup.set()
+        return serialize_document(job) if job else None
+
+    def _stale_running(self, now) -> dict:
+        return {"status": RUNNING, "heartbeat_at": {"$lt": now - timedelta(seconds=JOB_TIMEOUT_SECONDS)}}
+
+    @staticmethod
+    def _leased(job: dict) -> dict:
+        return {"_id": job["_id"], "worker": job["worker"], "lease_id": job["lease_id"]}
+
+    async def _expire(self):
+        # Lost jobs that already used their last attempt are not run again
+        collection = await self.repository.get_jobs_collection()
+        now = _now()
+        result = await collection.update_many(
+            {**self._stale_running(now), "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"$set": {"status": DEAD_LETTER, "error": "Timed out: the worker running the job stopped responding",
+                      "finished_at": now, "updated_at": now}},
+        )
+        if result.modified_count:
+            print(f"Moved {result.modified_count} timed-out job(s) to dead letter")
+
+    async def _claim(self) -> Optional[dict]:
+        collection = await self.repository.get_jobs_collection()
+        now = _now()
+        return await collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "available_at": {"$lte": now}},
+                {**self._stale_running(now), "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+            ]},
+            {"$set": {"status": RUNNING, "started_at": now, "heartbeat_at": now, "updated_at": now,
+                      "worker": self.worker_name, "lease_id": uuid.uuid4().hex},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job: dict):
+        collection = await self.repository.get_jobs_collection()
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                result = await collection.update_one(self._leased(job), {"$set": {"heartbeat_at": _now()}})
+                if not result.matched_count:
+                    print(f"{job['type']} job {job['_id']} lost its lease; its result will be discarded")
+                    return
+            except Exception as e:
+                print(f"Error renewing the lease of job {job['_id']}: {str(e)}")
+
+    async def _record(self, job: dict, update: dict) -> bool:
+        collection = await self.repository.get_jobs_collection()
+        result = await collection.update_one(self._leased(job), update)
+        if not result.matched_count:
+            print(f"{job['type']} job {job['_id']} was taken over by another worker; not recording this run")
+        return bool(result.matched_count)
+
+    async def _finish(self, job: dict, result):
+        now = _now()
+        if await self._record(job, {"$set": {"status": COMPLETED, "result": result, "error": None,
+                                             "finished_at": now, "updated_at": now}}):
+            print(f"Completed {job['type']} job {job['_id']}")
+
+    async def _defer(self, job: dict, error: Exception):
+        # The claim's attempt is given back: the job never got to run, so it can't count toward max_attempts
+        now = _now()
+        deferrals = job.get("deferrals", 0) + 1
+        delay = min(JOB_RETRY_BASE_SECONDS * (2 ** (deferrals - 1)), JOB_DEFER_MAX_SECONDS)
+        if await self._record(job, {
+            "$set": {"status": QUEUED, "deferrals": deferrals, "available_at": now + timedelta(seconds=delay),
+                     "updated_at": now},
+            "$inc": {"attempts": -1},
+        }):
+            print(f"{job['type']} job {job['_id']} deferred, retrying in {delay:.0f}s: {str(error)}")
+
+    async def _fail(self, job: dict, error: Exception):
+        if isinstance(error, self.transient_errors):
+            await self._defer(job, error)
+            return
+        now = _now()
+        permanent = isinstance(error, self.permanent_errors)
+        if permanent or job["attempts"] >= job.get("max_attempts", self.max_attempts):
+            update = {"status": DEAD_LETTER, "error": str(error), "finished_at": now, "updated_at": now}
+            print(f"{job['type']} job {job['_id']} moved to dead letter after {job['attempts']} attempt(s): {str(error)}")
+        else:
+            delay = JOB_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+            update = {"status": QUEUED, "error": str(error), "available_at": now + timedelta(seconds=delay), "updated_at": now}
+            print(f"{job['type']} job {job['_id']} failed (attempt {job['attempts']}), retrying in {delay:.0f}s: {str(error)}")
+        await self._record(job, {"$set": update})
+
+    async def _worker(self):
+        # The flag backs up cancellation, which wait_for can swallow if the wakeup fires at the same moment
+        while not self._stopping:
+            try:
+                await self._expire()
+                job = await self._claim()
+                # Indexes that couldn't be created at startup (database down) are created once it is back
+                if not self._indexes_ready:
+                    await self.ensure_indexes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                # Sleep until a job is enqueued in this process or the poll interval elapses
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                handler = self._handlers.get(job["type"])
+                if handler is None:
+                    raise ValueError(f"No handler registered for job type {job['type']}")
+                heartbeat = asyncio.create_task(self._heartbeat(job))
+                try:
+                    result = await handler(job["payload"])
+                finally:
+                    heartbeat.cancel()
+                await self._finish(job, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not isinstance(e, self.transient_errors):
+                    traceback.print_exc()
+                try:
+                    await self._fail(job, e)
+                except Exception as e_fail:
+                    print(f"Error recording job failure: {str(e_fail)}")
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        # Workers start even if the database is unreachable; they keep polling until it is back
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"Started {self.workers} job worker(s)")
+
+    async def stop(self):
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
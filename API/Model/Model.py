@@ -9,32 +9,41 @@ from tensorflow.keras.models import Model
 
 
 
-def downsample(filters, size, apply_batchnorm=True):
+def downsample(filters, size, apply_batchnorm=True, fused=False):
 
   result = tf.keras.Sequential()
-  result.add(tf.keras.layers.Conv2D(filters, size, strides=2, padding='same',kernel_initializer='he_normal', use_bias=False))
+  # A fused block folds its batchnorm into the conv, so the conv needs a bias instead
+  result.add(tf.keras.layers.Conv2D(filters, size, strides=2, padding='same',kernel_initializer='he_normal', use_bias=fused and apply_batchnorm))
 
-  if apply_batchnorm:
+  if apply_batchnorm and not fused:
     result.add(tf.keras.layers.BatchNormalization())
 
   result.add(tf.keras.layers.LeakyReLU())
   return result
 
 
-def upsample(filters, size, apply_dropout=False):
+def upsample(filters, size, apply_dropout=False, fused=False):
 
   result = tf.keras.Sequential()
-  result.add(tf.keras.layers.Conv2DTranspose(filters, size, strides=2,padding='same',kernel_initializer='he_normal',use_bias=False))
-  result.add(tf.keras.layers.BatchNormalization())
+  result.add(tf.keras.layers.Conv2DTranspose(filters, size, strides=2,padding='same',kernel_initializer='he_normal',use_bias=fused))
 
-  if apply_dropout:
+  if not fused:
+    result.add(tf.keras.layers.BatchNormalization())
+
+  # Dropout is a no-op at inference, so the inference-only fused variant leaves it out
+  if apply_dropout and not fused:
       result.add(tf.keras.layers.Dropout(0.5))
 
   result.add(tf.keras.layers.ReLU())
   return result
 
 
-def Generator():
+def Generator(fused=False):
+  """
+  Build the U-Net generator. With fused=True, the inference-only variant is built: same topology,
+  but every BatchNormalization is left out so its statistics can be folded into the preceding
+  conv's kernel and bias (see export.py).
+  """
   inputs = tf.keras.layers.Input(shape=[256,256,3])
   
   # Define a residual block
@@ -45,13 +54,15 @@ def Generator():
       # First convolution layer
       x = tf.keras.layers.Conv2D(filters, kernel_size, padding='same', 
                                 kernel_initializer=tf.random_normal_initializer(0., 0.02))(x)
-      x = tf.keras.layers.BatchNormalization()(x)
+      if not fused:
+        x = tf.keras.layers.BatchNormalization()(x)
       x = tf.keras.layers.LeakyReLU(0.2)(x)
       
       # Second convolution layer
       x = tf.keras.layers.Conv2D(filters, kernel_size, padding='same',
                                 kernel_initializer=tf.random_normal_initializer(0., 0.02))(x)
-      x = tf.keras.layers.BatchNormalization()(x)
+      if not fused:
+        x = tf.keras.layers.BatchNormalization()(x)
       
       # Add the shortcut (input) to the output
       x = tf.keras.layers.Add()([shortcut, x])
@@ -60,11 +71,11 @@ def Generator():
       return x
   
   down_stack = [
-    downsample(64, 4, apply_batchnorm=False), # (bs, 128, 128, 64)
-    downsample(128, 4), # (bs, 64, 64, 128)
-    downsample(256, 4), # (bs, 32, 32, 256)
-    downsample(512, 4), # (bs, 16, 16, 512)
-    downsample(512, 4), # (bs, 8, 8, 512)
+    downsample(64, 4, apply_batchnorm=False, fused=fused), # (bs, 128, 128, 64)
+    downsample(128, 4, fused=fused), # (bs, 64, 64, 128)
+    downsample(256, 4, fused=fused), # (bs, 32, 32, 256)
+    downsample(512, 4, fused=fused), # (bs, 16, 16, 512)
+    downsample(512, 4, fused=fused), # (bs, 8, 8, 512)
     # downsample(512, 4), # (bs, 4, 4, 512)
     # downsample(512, 4), # (bs, 2, 2, 512)
     # downsample(512, 4), # (bs, 1, 1, 512)
@@ -73,11 +84,11 @@ def Generator():
   up_stack = [
     # upsample(512, 4, apply_dropout=True), # (bs, 2, 2, 1024)
     # upsample(512, 4, apply_dropout=True), # (bs, 4, 4, 1024)
-    upsample(512, 4, apply_dropout=True), # (bs, 8, 8, 1024)
-    upsample(512, 4), # (bs, 16, 16, 1024)
-    upsample(256, 4), # (bs, 32, 32, 512)
-    upsample(128, 4), # (bs, 64, 64, 256)
-    upsample(64, 4), # (bs, 128, 128, 128)
+    upsample(512, 4, apply_dropout=True, fused=fused), # (bs, 8, 8, 1024)
+    upsample(512, 4, fused=fused), # (bs, 16, 16, 1024)
+    upsample(256, 4, fused=fused), # (bs, 32, 32, 512)
+    upsample(128, 4, fused=fused), # (bs, 64, 64, 256)
+    upsample(64, 4, fused=fused), # (bs, 128, 128, 128)
   ]
   
   initializer = tf.random_normal_initializer(0., 0.02)
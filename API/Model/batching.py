@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Model.registry import registry
+except ImportError:
+    # When running directly
+    try:
+        # Try relative import
+        from .registry import registry
+    except ImportError:
+        # Direct import when run from the Model directory
+        from registry import registry
+
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+
+class _PendingRequest:
+    __slots__ = ("image", "future", "enqueued_at")
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Collects single-image inference requests and runs them through the model in batches.
+    A batch is dispatched as soon as it holds max_batch_size images or the oldest request
+    has waited max_wait_ms, whichever comes first. Each caller gets a Future that resolves
+    to its own (256, 256, 3) prediction.
+    Up to max_in_flight batches run at once (one per inference worker process); the next batch
+    is only collected once one of them finishes, so requests keep filling it in the meantime.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 max_in_flight: int = 1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._executor = None
+        if self.max_in_flight > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="batch-dispatch")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._requests = 0
+        self._failed_batches = 0
+        self._queue_latency_total = 0.0
+        self._queue_latency_max = 0.0
+        self._inference_time_total = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, image) -> Future:
+        """
+        Queue one (256, 256, 3) float32 image, or a frame slot of an inference worker pool
+        (see workers.py), and return a Future for its prediction. A slot's prediction is
+        its shared-memory output view, valid until the caller releases the slot.
+        """
+        if self._thread is None:
+            self.start()
+        request = _PendingRequest(image)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, image: np.ndarray) -> np.ndarray:
+        """
+        Blocking helper for synchronous callers.
+        """
+        return self.submit(image).result()
+
+    def _collect_batch(self, first: _PendingRequest):
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Requests already waiting are taken first, so a backlog always fills the batch
+            # even when the oldest request is past its deadline
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if request is None:
+                # Put the stop sentinel back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            self._in_flight.acquire()
+            first = self._queue.get()
+            if first is None:
+                self._in_flight.release()
+                break
+            batch = self._collect_batch(first)
+            if self._executor is not None:
+                self._executor.submit(self._dispatch, batch)
+            else:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        started_at = time.perf_counter()
+        failed = False
+        arrays = [request for request in batch if isinstance(request.image, np.ndarray)]
+        slots = [request for request in batch if not isinstance(request.image, np.ndarray)]
+        try:
+            if arrays:
+                failed |= self._run_arrays(arrays)
+            # Slots taken before a model reload still belong to the previous pool
+            owners = {}
+            for request in slots:
+                owners.setdefault(id(request.image.owner), []).append(request)
+            for group in owners.values():
+                failed |= self._run_slots(group)
+        finally:
+            self._in_flight.release()
+        self._record(batch, started_at, time.perf_counter(), failed)
+
+    def _run_arrays(self, batch) -> bool:
+        try:
+            inputs = np.stack([request.image for request in batch]).astype(np.float32, copy=False)
+            outputs = self.predict_fn(inputs)
+            for request, output in zip(batch, outputs):
+                request.future.set_result(output)
+            return False
+        except Exception as e:
+            return self._fail(batch, e)
+
+    def _run_slots(self, batch) -> bool:
+        try:
+            # Frames are already in shared memory; only the slot indices go to the worker
+            batch[0].image.owner.run_slots([request.image.index for request in batch])
+            for request in batch:
+                request.future.set_result(request.image.output)
+            return False
+        except Exception as e:
+            return self._fail(batch, e)
+
+    def _fail(self, batch, e: Exception) -> bool:
+        print(f"Error in batched inference: {str(e)}")
+        for request in batch:
+            if not request.future.done():
+                request.future.set_exception(e)
+        return True
+
+    def _record(self, batch, started_at: float, finished_at: float, failed: bool):
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            if failed:
+                self._failed_batches += 1
+            for request in batch:
+                latency = started_at - request.enqueued_at
+                self._queue_latency_total += latency
+                self._queue_latency_max = max(self._queue_latency_max, latency)
+            self._inference_time_total += finished_at - started_at
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            batches = self._batches
+            requests = self._requests
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_in_flight": self.max_in_flight,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "pending": self._queue.qsize(),
+                "batches": batches,
+                "requests": requests,
+                "failed_batches": self._failed_batches,
+                "avg_batch_size": requests / batches if batches else 0.0,
+                "batch_fill_ratio": requests / (batches * self.max_batch_size) if batches else 0.0,
+                "avg_queue_latency_ms": 1000.0 * self._queue_latency_total / requests if requests else 0.0,
+                "max_queue_latency_ms": 1000.0 * self._queue_latency_max,
+                "avg_batch_inference_ms": 1000.0 * self._inference_time_total / batches if batches else 0.0,
+            }
+
+    def reset_metrics(self):
+        with self._stats_lock:
+            self._reset_stats()
+
+
+scheduler = BatchScheduler(registry.predict, max_in_flight=max(1, registry.workers))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_DIR = os.getenv("RESULT_CACHE_DIR")  # Disk tier is disabled unless a directory is configured
+
+
+def image_key(image: np.ndarray, weights_version: str) -> str:
+    """
+    Content address for a colorization result: the decoded input pixels plus the model weights.
+    Re-encoding the same picture (different JPEG bytes, same pixels) still hits the cache.
+    """
+    pixels = np.ascontiguousarray(image)
+    digest = hashlib.sha256()
+    digest.update(f"{pixels.shape}|{pixels.dtype}|{weights_version}".encode())
+    digest.update(memoryview(pixels).cast("B"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for colorized results.
+    The memory tier is an LRU bounded by max_bytes of stored content; the optional disk tier
+    keeps every entry under cache_dir so results survive restarts and are shared by workers.
+    Each entry holds the colorized image bytes only, never URLs of stored assets: every document uploads
+    its own copy, so deleting one document's assets can't leave cache hits pointing at deleted files.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, cache_dir: Optional[str] = CACHE_DIR):
+        self.max_bytes = max(0, max_bytes)
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        content = entry.get("content")
+        return len(content) if content else 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def _remember(self, key: str, entry: dict):
+        size = self._entry_size(entry)
+        if size > self.max_bytes:
+            # Too big for the memory tier; it is only kept on disk
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= self._entry_size(previous)
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(evicted)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return {"content": f.read()}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading cache entry {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, entry: dict):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(entry["content"])
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing cache entry {key}: {str(e)}")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, content: bytes):
+        entry = {"content": bytes(content)}
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.cache_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
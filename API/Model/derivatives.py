@@ -0,0 +1,52 @@
+import os
+from typing import Dict
+import numpy as np
+import cv2
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Model.inference import to_uint8
+except ImportError:
+    # When running directly
+    try:
+        # Try relative import
+        from .inference import to_uint8
+    except ImportError:
+        # Direct import when run from the Model directory
+        from inference import to_uint8
+
+
+# Longest side in pixels of each downscaled level; "full" is the stored image itself
+DERIVATIVE_SIZES = {
+    "preview": int(os.getenv("PREVIEW_SIZE", "1024")),
+    "thumbnail": int(os.getenv("THUMBNAIL_SIZE", "256")),
+}
+DERIVATIVE_NAMES = ("thumbnail", "preview", "full")
+DERIVATIVE_JPEG_QUALITY = int(os.getenv("DERIVATIVE_JPEG_QUALITY", "85"))
+
+
+def build_derivatives(image: np.ndarray, rgb: bool = False) -> Dict[str, bytes]:
+    """
+    Downscale an already decoded image into the derivative pyramid and JPEG-encode each level.
+    `image` is in OpenCV (BGR) channel order unless rgb is True, e.g. for the output of decode_image.
+    Levels are produced largest first, each from the previous one with INTER_AREA, so the full-size
+    image is only read once. Levels that wouldn't be smaller than the source are skipped;
+    clients fall back to the full image for them.
+    """
+    level = to_uint8(image)
+    if rgb:
+        level = cv2.cvtColor(level, cv2.COLOR_RGB2BGR)
+    derivatives = {}
+    for name, size in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+        height, width = level.shape[:2]
+        if max(height, width) <= size:
+            continue
+        scale = size / max(height, width)
+        level = cv2.resize(level, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode(".jpg", level, [cv2.IMWRITE_JPEG_QUALITY, DERIVATIVE_JPEG_QUALITY])
+        if not success:
+            raise ValueError(f"Could not encode the {name} derivative")
+        derivatives[name] = buffer.tobytes()
+    return derivatives
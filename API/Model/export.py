@@ -0,0 +1,321 @@
+"""
+Export step for serving: freezes the generator into an optimized artifact and reports what it costs in accuracy.
+
+Every export first folds each BatchNormalization into the conv (or deconv) before it, using a fused
+Generator variant whose convs carry the folded kernel and bias. It then writes one of:
+
+  - a SavedModel whose serving tf.function traces the fused graph (optionally XLA-compiled), or
+  - a TFLite flatbuffer, optionally quantized: float16 weights, or int8 dynamic-range weights.
+
+    python API/Model/export.py export --weights API/Model/Weight/modelGen_1.h5 --format tflite --quantize int8 --output generator_int8.tflite
+    python API/Model/export.py report --weights API/Model/Weight/modelGen_1.h5 --data Data --limit 200
+
+`report` exports every variant to a temp directory (or takes --artifacts) and compares them on the held-out
+split from DataProcessing/make_csvFile.py (Data/test.csv). It reports PSNR against the ground-truth color
+frames, drift from the original eager model, latency per image and artifact size. Point the API at an
+artifact with MODEL_ARTIFACT=<path> (see registry.py).
+"""
+import argparse
+import csv
+import os
+import statistics
+import tempfile
+import threading
+import time
+import numpy as np
+import cv2
+import tensorflow as tf
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Model.Model import Generator
+    from API.Model.inference import prepare_input, to_uint8
+except ImportError:
+    # When running directly
+    try:
+        # Try relative import
+        from .Model import Generator
+        from .inference import prepare_input, to_uint8
+    except ImportError:
+        # Direct import when run from the Model directory
+        from Model import Generator
+        from inference import prepare_input, to_uint8
+
+
+SIZE = 256
+FORMATS = ("savedmodel", "tflite")
+QUANTIZATIONS = ("none", "float16", "int8")
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", str(os.cpu_count() or 1)))
+
+
+def _leaf_layers(model) -> list:
+    # Flatten the nested Sequential blocks, in construction order
+    layers = []
+    for layer in model.layers:
+        if hasattr(layer, "layers"):
+            layers.extend(_leaf_layers(layer))
+        else:
+            layers.append(layer)
+    return layers
+
+
+def fold_batchnorm(model) -> tf.keras.Model:
+    """
+    Build the fused Generator and load it with model's weights, folding every BatchNormalization
+    into the conv that feeds it:  W' = W * gamma / sqrt(var + eps),  b' = (b - mean) * gamma / sqrt(var + eps) + beta.
+    """
+    fused = Generator(fused=True)
+    conv_types = (tf.keras.layers.Conv2D, tf.keras.layers.Conv2DTranspose)
+    source_layers = _leaf_layers(model)
+    convs = [layer for layer in source_layers if isinstance(layer, conv_types)]
+    fused_convs = [layer for layer in _leaf_layers(fused) if isinstance(layer, conv_types)]
+    if len(convs) != len(fused_convs):
+        raise ValueError(f"Model has {len(convs)} conv layers, the fused generator has {len(fused_convs)}")
+    batchnorm_after = {
+        id(layer.input._keras_history.operation): layer
+        for layer in source_layers if isinstance(layer, tf.keras.layers.BatchNormalization)
+    }
+
+    for conv, target in zip(convs, fused_convs):
+        kernel = conv.kernel.numpy()
+        bias = conv.bias.numpy() if conv.use_bias else np.zeros(conv.filters, dtype=kernel.dtype)
+        batchnorm = batchnorm_after.get(id(conv))
+        if batchnorm is not None:
+            gamma = batchnorm.gamma.numpy() if batchnorm.scale else 1.0
+            beta = batchnorm.beta.numpy() if batchnorm.center else 0.0
+            scale = gamma / np.sqrt(batchnorm.moving_variance.numpy() + batchnorm.epsilon)
+            # Output channels are the last kernel axis for Conv2D, the third for Conv2DTranspose
+            if isinstance(conv, tf.keras.layers.Conv2DTranspose):
+                kernel = kernel * scale[None, None, :, None]
+            else:
+                kernel = kernel * scale
+            bias = (bias - batchnorm.moving_mean.numpy()) * scale + beta
+        if kernel.shape != tuple(target.kernel.shape):
+            raise ValueError(f"Kernel shape mismatch between {conv.name} {kernel.shape} and {target.name} {tuple(target.kernel.shape)}")
+        target.kernel.assign(kernel.astype(np.float32))
+        if target.use_bias:
+            target.bias.assign(bias.astype(np.float32))
+        elif np.any(bias):
+            raise ValueError(f"{target.name} has no bias to hold the folded batchnorm of {conv.name}")
+    return fused
+
+
+def load_generator(weights_path: str, fused: bool = True) -> tf.keras.Model:
+    model = Generator()
+    model.load_weights(weights_path)
+    return fold_batchnorm(model) if fused else model
+
+
+def serving_function(model, jit_compile: bool = False):
+    @tf.function(input_signature=[tf.TensorSpec([None, SIZE, SIZE, 3], tf.float32, name="gray")], jit_compile=jit_compile)
+    def serve(gray):
+        return model(gray, training=False)
+    return serve
+
+
+def export_savedmodel(model, output_path: str, jit_compile: bool = False):
+    module = tf.Module()
+    module.model = model
+    module.serve = serving_function(model, jit_compile)
+    tf.saved_model.save(module, output_path, signatures={"serving_default": module.serve})
+
+
+def export_tflite(model, output_path: str, quantize: str = "none"):
+    # from_keras_model freezes the Keras variables into the flatbuffer; converting the tf.Module
+    # SavedModel keeps them as resource variables that the interpreter never initializes
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize in ("float16", "int8"):
+        # Dynamic-range quantization: weights are stored reduced, activations stay float32
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantize == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export(weights_path: str, output_path: str, fmt: str = "tflite", quantize: str = "none",
+           jit_compile: bool = False) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}, expected one of {FORMATS}")
+    if quantize != "none" and fmt != "tflite":
+        raise ValueError("Quantization is only available for the tflite format")
+    start_time = time.time()
+    model = load_generator(weights_path)
+    if fmt == "savedmodel":
+        export_savedmodel(model, output_path, jit_compile)
+    else:
+        export_tflite(model, output_path, quantize)
+    print(f"Exported {fmt} ({quantize}) to {output_path} in {time.time() - start_time:.2f} seconds")
+    return output_path
+
+
+class SavedModelRunner:
+    """
+    Runs an exported SavedModel with the same call signature as the Keras model.
+    """
+
+    def __init__(self, path: str):
+        self._module = tf.saved_model.load(path)
+
+    def __call__(self, batch, training=False):
+        return self._module.serve(tf.convert_to_tensor(batch, dtype=tf.float32))
+
+
+class TFLiteRunner:
+    """
+    Runs an exported TFLite model with the same call signature as the Keras model.
+    The interpreter is resized to each new batch size; calls are serialized because it isn't thread-safe.
+    """
+
+    def __init__(self, path: str, num_threads: int = TFLITE_NUM_THREADS):
+        self._interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def __call__(self, batch, training=False):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if self._batch_size != len(batch):
+                self._interpreter.resize_tensor_input(self._input, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+def load_artifact(path: str):
+    if path.endswith(".tflite"):
+        return TFLiteRunner(path)
+    return SavedModelRunner(path)
+
+
+def artifact_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def load_test_set(data_dir: str, limit: int):
+    """
+    Load (model input, ground-truth color) pairs from data_dir/test.csv, whose paths are relative to
+    data_dir/original. Frames are read with OpenCV, which gives the channel order the API feeds the model.
+    Returns (inputs, targets), or (None, None) if the split isn't available.
+    """
+    csv_path = os.path.join(data_dir, "test.csv")
+    if not os.path.exists(csv_path):
+        return None, None
+    inputs, targets = [], []
+    with open(csv_path, newline="") as f:
+        for row in csv.DictReader(f):
+            gray = cv2.imread(os.path.join(data_dir, "original", row["grayPath"])) if row.get("grayPath") else None
+            color = cv2.imread(os.path.join(data_dir, "original", row["colorPath"]))
+            if gray is None or color is None:
+                continue
+            inputs.append(prepare_input(gray))
+            targets.append(cv2.resize(color, (SIZE, SIZE), interpolation=cv2.INTER_AREA))
+            if len(inputs) >= limit:
+                break
+    if not inputs:
+        return None, None
+    return np.stack(inputs), np.stack(targets)
+
+
+def synthetic_inputs(count: int, seed: int = 0) -> np.ndarray:
+    # Smooth grayscale noise, only used to compare variants with each other when no dataset is present
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        small = rng.random((16, 16), dtype=np.float32)
+        gray = cv2.resize(small, (SIZE, SIZE), interpolation=cv2.INTER_CUBIC)
+        images.append(np.repeat(np.clip(gray, 0, 1)[..., None], 3, axis=2))
+    return np.stack(images).astype(np.float32)
+
+
+def run_batches(model, inputs: np.ndarray, batch_size: int):
+    """
+    Returns (outputs, seconds per image for each batch after a warm-up pass).
+    """
+    model(inputs[:batch_size], training=False)
+    outputs, timings = [], []
+    for start in range(0, len(inputs), batch_size):
+        batch = inputs[start:start + batch_size]
+        start_time = time.perf_counter()
+        outputs.append(np.asarray(model(batch, training=False)))
+        timings.append((time.perf_counter() - start_time) / len(batch))
+    return np.concatenate(outputs), timings
+
+
+def psnr(outputs: np.ndarray, targets: np.ndarray) -> float:
+    mse = np.mean((outputs.astype(np.float64) - targets.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def report(weights_path: str, data_dir: str, limit: int, batch_size: int, artifacts=None, jit_compile: bool = False):
+    inputs, targets = load_test_set(data_dir, limit)
+    if inputs is None:
+        print(f"No held-out set at {os.path.join(data_dir, 'test.csv')}, using {limit} synthetic inputs (no PSNR)")
+        inputs = synthetic_inputs(limit)
+    else:
+        print(f"Evaluating on {len(inputs)} held-out frames from {data_dir}")
+
+    reference = Generator()
+    reference.load_weights(weights_path)
+    variants = [("keras eager (current)", reference, artifact_size(weights_path))]
+    variants.append(("keras fused BN", fold_batchnorm(reference), None))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not artifacts:
+            fused = variants[1][1]
+            artifacts = [os.path.join(tmp_dir, "savedmodel")]
+            export_savedmodel(fused, artifacts[0], jit_compile)
+            for quantize in QUANTIZATIONS:
+                path = os.path.join(tmp_dir, f"generator_{quantize}.tflite")
+                export_tflite(fused, path, quantize)
+                artifacts.append(path)
+        for path in artifacts:
+            variants.append((os.path.basename(path.rstrip("/")), load_artifact(path), artifact_size(path)))
+
+        reference_outputs = None
+        print(f"{'Variant':<26} {'size (MB)':>9} {'ms/img bs=1':>12} {f'ms/img bs={batch_size}':>12} "
+              f"{'PSNR (dB)':>10} {'MAE vs ref':>10} {'max diff':>9}")
+        for name, model, size in variants:
+            outputs, timings = run_batches(model, inputs, batch_size)
+            _, single_timings = run_batches(model, inputs[:min(len(inputs), 8)], 1)
+            outputs = to_uint8(outputs)
+            if reference_outputs is None:
+                reference_outputs = outputs
+            drift = np.abs(outputs.astype(np.int16) - reference_outputs.astype(np.int16))
+            quality = f"{psnr(outputs, targets):>10.2f}" if targets is not None else f"{'n/a':>10}"
+            size_mb = f"{size / 1e6:>9.1f}" if size else f"{'-':>9}"
+            print(f"{name:<26} {size_mb} {statistics.median(single_timings) * 1000:>12.1f} "
+                  f"{statistics.median(timings) * 1000:>12.1f} {quality} {drift.mean():>10.3f} {int(drift.max()):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the generator for serving and compare the variants")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Fold batchnorm and write a serving artifact")
+    export_parser.add_argument("--weights", required=True)
+    export_parser.add_argument("--output", required=True, help=".tflite file or SavedModel directory")
+    export_parser.add_argument("--format", choices=FORMATS, default="tflite")
+    export_parser.add_argument("--quantize", choices=QUANTIZATIONS, default="none")
+    export_parser.add_argument("--xla", action="store_true", help="XLA-compile the SavedModel serving function")
+
+    report_parser = subparsers.add_parser("report", help="Accuracy vs latency of each variant on the held-out set")
+    report_parser.add_argument("--weights", required=True)
+    report_parser.add_argument("--data", default="Data", help="Directory with test.csv and original/")
+    report_parser.add_argument("--limit", type=int, default=200)
+    report_parser.add_argument("--batch-size", type=int, default=8)
+    report_parser.add_argument("--artifacts", nargs="*", help="Existing artifacts to compare instead of exporting all variants")
+    report_parser.add_argument("--xla", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.weights, args.output, args.format, args.quantize, args.xla)
+    else:
+        report(args.weights, args.data, args.limit, args.batch_size, args.artifacts, args.xla)
@@ -1,43 +1,177 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
 import os
+import sys
 import time
-import requests
 from io import BytesIO
+from concurrent.futures import Future
 import cv2
-import matplotlib.pyplot as plt
-# from Model import Generator
 
 # Handle imports for both module usage and direct script execution
 try:
     # When used as a module in the package
-    from API.Model.Model import Generator
+    from API.Model.batching import scheduler
+    from API.Model.registry import registry
+    from API.Model.tiling import tiled_predict
 except ImportError:
     # When running directly
     try:
         # Try relative import
-        from .Model import Generator
+        from .batching import scheduler
+        from .registry import registry
+        from .tiling import tiled_predict
     except ImportError:
         # Direct import when run from the Model directory
-        from Model import Generator
+        from batching import scheduler
+        from registry import registry
+        from tiling import tiled_predict
+
+try:
+    from API.Storage.http_client import fetch
+except ImportError:
+    try:
+        from ..Storage.http_client import fetch
+    except (ImportError, ValueError):
+        # Direct import when run from the API directory, or from the Model directory with API on the path
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from Storage.http_client import fetch
+
+
+SIZE = 256
+
+# "resize" stretches the 256x256 RGB prediction back to the input size,
+# "lab" keeps the full-resolution luminance of the source and only upsamples the predicted chroma,
+# "tiled" runs overlapping 256x256 tiles of the full-resolution image through the model
+COLORIZE_MODES = ("resize", "lab", "tiled")
+COLORIZE_MODE = os.getenv("COLORIZE_MODE", "resize")
+
+
+def decode_image(content: bytes) -> np.ndarray:
+    """
+    Decode raw image bytes into an RGB uint8 array.
+    """
+    # File-like buffers (e.g. a memory-mapped stored file) are decoded in place
+    return np.array(Image.open(content if hasattr(content, "read") else BytesIO(content)).convert("RGB"))
+
+
+def transfer_chroma(source: np.ndarray, prediction: np.ndarray) -> np.ndarray:
+    """
+    Combine the full-resolution luminance of source (uint8, model channel order) with the
+    chroma of a low-resolution prediction (float in [0, 1]). Only the two chroma planes are
+    upsampled, in a single vectorized resize, and everything stays in uint8.
+    """
+    height, width = source.shape[:2]
+    chroma = cv2.cvtColor(to_uint8(prediction), cv2.COLOR_BGR2Lab)[..., 1:]
+    chroma = cv2.resize(chroma, (width, height), interpolation=cv2.INTER_LINEAR)
+    lab = cv2.cvtColor(source, cv2.COLOR_BGR2Lab)
+    lab[..., 1:] = chroma
+    return cv2.cvtColor(lab, cv2.COLOR_Lab2BGR)
+
+
+def prepare_input(source: np.ndarray) -> np.ndarray:
+    """
+    Resize a uint8 image (already in model channel order) to the normalized 256x256 model input.
+    """
+    gray = cv2.resize(source, (SIZE, SIZE))
+    return (gray / 255.0).astype(np.float32)
+
+
+def finish_prediction(source: np.ndarray, prediction: np.ndarray, mode: str = None) -> np.ndarray:
+    """
+    Bring a 256x256 prediction back to the size of source using the given colorize mode.
+    """
+    mode = mode or COLORIZE_MODE
+    if mode == "lab":
+        return transfer_chroma(source, prediction)
+    return cv2.resize(prediction,[source.shape[1],source.shape[0]])
+
+
+def submit_frame(frame: np.ndarray) -> Future:
+    """
+    Queue one uint8 (256, 256, 3) frame (model channel order) and return a Future for its prediction.
+    With inference workers the frame is written into a shared-memory slot and its prediction is copied
+    out as soon as it's ready, so the slot is recycled without waiting for the caller.
+    """
+    slot = registry.frame_slot()
+    if slot is None:
+        return scheduler.submit(frame.astype(np.float32) / 255.0)
+    result = Future()
+
+    def copy_out(future):
+        try:
+            result.set_result(np.array(future.result()))
+        except Exception as e:
+            result.set_exception(e)
+        finally:
+            slot.release()
+
+    try:
+        slot.input[...] = frame
+        scheduler.submit(slot).add_done_callback(copy_out)
+    except Exception:
+        slot.release()
+        raise
+    return result
+
+
+def colorize_array(image: np.ndarray, mode: str = None) -> np.ndarray:
+    """
+    Colorize an already decoded RGB image and return the prediction at the original size.
+    The "resize" and "tiled" modes return a float image in [0, 1]; the "lab" mode returns uint8.
+    """
+    mode = mode or COLORIZE_MODE
+    if mode not in COLORIZE_MODES:
+        raise ValueError(f"Unknown colorize mode: {mode}")
+    source = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if mode == "tiled":
+        # Tiles go through the batch scheduler so they share batches with other requests
+        return tiled_predict(source, submit_frame)
+    slot = registry.frame_slot()
+    if slot is None:
+        # Queued with other pending requests and run as one batched forward pass
+        prediction = scheduler.predict(prepare_input(source))
+        return finish_prediction(source, prediction, mode)
+    with slot:
+        # The decoded frame is resized straight into shared memory and the worker writes its prediction
+        # back in place; finish_prediction reads it there before the slot is recycled
+        cv2.resize(source, (SIZE, SIZE), dst=slot.input)
+        return finish_prediction(source, scheduler.predict(slot), mode)
+
+
+def colorize_bytes(content: bytes) -> np.ndarray:
+    """
+    Colorize an image held in memory, e.g. a freshly uploaded file.
+    """
+    return colorize_array(decode_image(content))
+
+
+def image_extension(filename: str, default: str = ".jpg") -> str:
+    """
+    Pick the encoding format for a colorized image from the uploaded filename.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in (".jpg", ".jpeg", ".png", ".webp", ".bmp") else default
+
+
+def to_uint8(prediction: np.ndarray) -> np.ndarray:
+    if prediction.dtype == np.uint8:
+        return prediction
+    # Convert normalized image back to 0-255 range
+    return np.clip(prediction * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+
+def encode_image(prediction: np.ndarray, ext: str = ".jpg") -> bytes:
+    """
+    Encode a prediction (normalized float or uint8) into image bytes in memory (no temp files).
+    """
+    success, buffer = cv2.imencode(ext, to_uint8(prediction))
+    if not success:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buffer.tobytes()
 
 
 def Gen_Image(link):
-    SIZE = 256
-    req = requests.get(link)
-    gray = np.array(Image.open(BytesIO(req.content)))
-    shape_init = gray.shape
-    gray = cv2.cvtColor(gray, cv2.COLOR_BGR2RGB)
-    gray = cv2.resize(gray, (SIZE, SIZE))
-    gray = gray / 255.0
-    gray_tensor = tf.convert_to_tensor(gray, dtype=tf.float32)
-    gray_tensor = tf.expand_dims(gray_tensor, axis=0)  # Add batch dimension
-    model = Generator()
-    model.load_weights("./API/Model/Weight/modelGen_1.h5")
-    prediction = model(gray_tensor, training=False)
-    prediction = cv2.resize(np.array(prediction).squeeze(0),[shape_init[1],shape_init[0]])
-    return prediction
+    return colorize_bytes(fetch(link))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from typing import Optional
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Model.workers import InferenceWorkerPool, INFERENCE_WORKERS
+except ImportError:
+    # When running directly
+    try:
+        # Try relative import
+        from .workers import InferenceWorkerPool, INFERENCE_WORKERS
+    except ImportError:
+        # Direct import when run from the Model directory
+        from workers import InferenceWorkerPool, INFERENCE_WORKERS
+
+SIZE = 256
+# MODEL_ARTIFACT points at an optimized export from export.py (.tflite file or SavedModel directory)
+# and takes precedence over the Keras weights file
+DEFAULT_WEIGHTS_PATH = os.getenv("MODEL_ARTIFACT") or os.getenv("MODEL_WEIGHTS_PATH", "./API/Model/Weight/modelGen_1.h5")
+
+
+def _generator_class():
+    # Imported on first build so importing the API doesn't pay for loading TensorFlow
+    try:
+        # When used as a module in the package
+        from API.Model.Model import Generator
+    except ImportError:
+        # When running directly
+        try:
+            # Try relative import
+            from .Model import Generator
+        except ImportError:
+            # Direct import when run from the Model directory
+            from Model import Generator
+    return Generator
+
+
+def _export_module():
+    # Same lazy import for the artifact loaders, which pull in TensorFlow too
+    try:
+        from API.Model import export
+    except ImportError:
+        try:
+            from . import export
+        except ImportError:
+            import export
+    return export
+
+
+def is_artifact(path: str) -> bool:
+    return path.endswith(".tflite") or os.path.exists(os.path.join(path, "saved_model.pb"))
+
+
+class ModelRegistry:
+    """
+    Holds a single warm Generator per process, either the Keras model or an exported artifact.
+    With workers > 0 the model lives in that many pinned worker processes instead (see workers.py)
+    and predictions are dispatched to them.
+    The model is built lazily on first use (or eagerly via load()) and shared by all requests.
+    reload() builds the replacement model before swapping it in, so in-flight requests
+    keep using the old instance until the new one is ready.
+    """
+
+    def __init__(self, weights_path: str = DEFAULT_WEIGHTS_PATH, workers: int = INFERENCE_WORKERS):
+        self.weights_path = weights_path
+        self.workers = workers
+        self.version = 0
+        self._model = None
+        self._weights_digest = None
+        self._lock = threading.Lock()
+
+    def _build(self, weights_path: str):
+        start_time = time.time()
+        if self.workers > 0:
+            # Each worker builds and warms up its own model
+            return InferenceWorkerPool(weights_path, self.workers).start()
+        if is_artifact(weights_path):
+            model = _export_module().load_artifact(weights_path)
+        else:
+            model = _generator_class()()
+            model.load_weights(weights_path)
+        # Warm up with a dummy forward pass so the first real request doesn't pay for graph tracing
+        model(np.zeros((1, SIZE, SIZE, 3), dtype=np.float32), training=False)
+        print(f"Loaded generator weights from {weights_path} in {time.time() - start_time:.2f} seconds")
+        return model
+
+    def load(self):
+        """
+        Build the model if it hasn't been built yet and return it.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build(self.weights_path)
+                    self.version += 1
+        return self._model
+
+    def get_model(self):
+        return self.load()
+
+    def reload(self, weights_path: Optional[str] = None):
+        """
+        Rebuild the model from weights_path (or the current weights file) and swap it in.
+        """
+        path = weights_path or self.weights_path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Weights file does not exist: {path}")
+        model = self._build(path)
+        with self._lock:
+            previous, self._model = self._model, model
+            self.weights_path = path
+            self._weights_digest = None
+            self.version += 1
+            version = self.version
+        # Worker processes of the old model are stopped once their in-flight batches finish
+        if hasattr(previous, "close"):
+            previous.close()
+        return version
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run a forward pass on a (bs, 256, 256, 3) float32 batch and return a numpy array.
+        """
+        model = self.load()
+        return np.asarray(model(batch, training=False))
+
+    @property
+    def weights_version(self) -> str:
+        """
+        Content hash of the current weights file (or every file of a SavedModel directory),
+        stable across processes and restarts.
+        Used to key cached results so a weight swap never serves stale colorizations.
+        """
+        if self._weights_digest is None:
+            digest = hashlib.sha256()
+            if os.path.isdir(self.weights_path):
+                paths = sorted(os.path.join(root, name) for root, _, names in os.walk(self.weights_path) for name in names)
+            else:
+                paths = [self.weights_path]
+            try:
+                for path in paths:
+                    digest.update(os.path.relpath(path, self.weights_path).encode())
+                    with open(path, "rb") as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                            digest.update(chunk)
+                self._weights_digest = digest.hexdigest()[:16]
+            except OSError:
+                # Fall back to the path when the file can't be read
+                return os.path.basename(self.weights_path)
+        return self._weights_digest
+
+    @property
+    def is_loaded(self) -> bool:
+        # A worker pool whose processes all died and couldn't be restarted can't serve anything
+        model = self._model
+        return model is not None and getattr(model, "live_workers", 1) > 0
+
+    def frame_slot(self):
+        """
+        A free shared-memory frame slot of the worker pool, or None when the model runs in this process.
+        Raises RingFullError when the pool's slots stay taken.
+        """
+        model = self.load()
+        return model.slot() if hasattr(model, "slot") else None
+
+    def worker_stats(self) -> dict:
+        model = self._model
+        return model.stats() if hasattr(model, "stats") else {}
+
+    def close(self):
+        with self._lock:
+            model, self._model = self._model, None
+        if hasattr(model, "close"):
+            model.close()
+
+
+registry = ModelRegistry()
+
+
+def get_model():
+    return registry.get_model()
+
+
+def reload_model(weights_path=None):
+    return registry.reload(weights_path)
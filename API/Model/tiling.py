@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import cv2
+
+
+TILE_SIZE = 256
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "32"))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", "8"))
+
+
+def tile_positions(length: int, tile: int, overlap: int):
+    """
+    Start offsets of tiles covering [0, length) with at least `overlap` pixels shared between neighbours.
+    The last tile is aligned to the end so no tile runs past the image.
+    """
+    if length <= tile:
+        return [0]
+    stride = max(1, tile - overlap)
+    positions = list(range(0, length - tile, stride))
+    positions.append(length - tile)
+    return positions
+
+
+def feather_window(tile: int, overlap: int) -> np.ndarray:
+    """
+    2D blending weights that ramp linearly over the overlap band so seams fade into each other.
+    """
+    ramp = np.ones(tile, dtype=np.float32)
+    if overlap > 0:
+        edge = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge[::-1]
+    return np.outer(ramp, ramp)
+
+
+def tiled_predict(source: np.ndarray, submit, tile: int = TILE_SIZE, overlap: int = TILE_OVERLAP,
+                  batch_size: int = TILE_BATCH_SIZE) -> np.ndarray:
+    """
+    Colorize a large uint8 image by running overlapping tile x tile crops through the model.
+    `submit` takes one uint8 (tile, tile, 3) crop and returns a Future for its prediction.
+    At most batch_size tiles are in flight at once, so memory is bounded by the tile batch
+    rather than the image size; the result is accumulated into one preallocated float32 array.
+    """
+    overlap = min(max(0, overlap), tile // 2)
+    batch_size = max(1, batch_size)
+    height, width = source.shape[:2]
+
+    # Images smaller than a tile in either dimension are padded up to one tile and cropped afterwards
+    pad_bottom = max(0, tile - height)
+    pad_right = max(0, tile - width)
+    if pad_bottom or pad_right:
+        source = cv2.copyMakeBorder(source, 0, pad_bottom, 0, pad_right, cv2.BORDER_REFLECT_101)
+    padded_height, padded_width = source.shape[:2]
+
+    window = feather_window(tile, overlap)
+    output = np.zeros((padded_height, padded_width, 3), dtype=np.float32)
+    weights = np.zeros((padded_height, padded_width), dtype=np.float32)
+
+    boxes = [(y, x) for y in tile_positions(padded_height, tile, overlap)
+             for x in tile_positions(padded_width, tile, overlap)]
+    for start in range(0, len(boxes), batch_size):
+        chunk = boxes[start:start + batch_size]
+        futures = [
+            submit(source[y:y + tile, x:x + tile])
+            for y, x in chunk
+        ]
+        for (y, x), future in zip(chunk, futures):
+            prediction = future.result()
+            output[y:y + tile, x:x + tile] += prediction * window[..., None]
+            weights[y:y + tile, x:x + tile] += window
+
+    output /= weights[..., None]
+    return output[:height, :width]
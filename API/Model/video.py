@@ -0,0 +1,395 @@
+import argparse
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Model.registry import registry
+    from API.Model.inference import prepare_input, finish_prediction, transfer_chroma, to_uint8
+except ImportError:
+    # When running directly
+    try:
+        # Try relative import
+        from .registry import registry
+        from .inference import prepare_input, finish_prediction, transfer_chroma, to_uint8
+    except ImportError:
+        # Direct import when run from the Model directory
+        from registry import registry
+        from inference import prepare_input, finish_prediction, transfer_chroma, to_uint8
+
+
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "8"))
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", "32"))
+VIDEO_COLORIZE_MODE = os.getenv("VIDEO_COLORIZE_MODE", "lab")  # "resize" or "lab"
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "1"))
+# Finished jobs (and their output files) are forgotten after this long, or once more than
+# VIDEO_MAX_FINISHED_JOBS have piled up, oldest first
+VIDEO_JOB_RETENTION_SECONDS = float(os.getenv("VIDEO_JOB_RETENTION_SECONDS", "3600"))
+VIDEO_MAX_FINISHED_JOBS = int(os.getenv("VIDEO_MAX_FINISHED_JOBS", "100"))
+# Files another (possibly dead) server process left this long untouched belong to no running job
+VIDEO_JOB_TIMEOUT_SECONDS = float(os.getenv("VIDEO_JOB_TIMEOUT_SECONDS", str(6 * 3600)))
+
+# Temporal reuse: frames close enough to the last inferred keyframe reuse its chroma
+VIDEO_REUSE = os.getenv("VIDEO_REUSE", "true").lower() in ("1", "true", "yes")
+VIDEO_DIFF_METHOD = os.getenv("VIDEO_DIFF_METHOD", "luma")  # "luma" or "phash"
+VIDEO_DIFF_THRESHOLD = os.getenv("VIDEO_DIFF_THRESHOLD")  # Defaults depend on the method
+VIDEO_KEYFRAME_INTERVAL = int(os.getenv("VIDEO_KEYFRAME_INTERVAL", "30"))
+
+_END = object()  # Sentinel marking the end of the frame stream
+
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    # Bounded put that gives up when the pipeline is being torn down
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+class FrameDiffer:
+    """
+    Decides which frames need a fresh forward pass.
+    A frame is a keyframe when it is the first one, when it differs from the last keyframe by more
+    than `threshold`, or when `max_interval` frames have passed since the last keyframe.
+    The "luma" method compares mean absolute difference of small grayscale thumbnails (0-1 scale),
+    the "phash" method compares 64-bit difference hashes (Hamming distance in bits).
+    """
+
+    DEFAULT_THRESHOLDS = {"luma": 0.02, "phash": 6}
+
+    def __init__(self, method: str = VIDEO_DIFF_METHOD, threshold: float = None,
+                 max_interval: int = VIDEO_KEYFRAME_INTERVAL):
+        if method not in self.DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown frame difference method: {method}")
+        self.method = method
+        self.threshold = float(threshold) if threshold is not None else self.DEFAULT_THRESHOLDS[method]
+        self.max_interval = max(1, max_interval)
+        self._reference = None
+        self._since_keyframe = 0
+        self.keyframes = 0
+        self.reused = 0
+
+    def _signature(self, frame: np.ndarray):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.method == "phash":
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            return (small[:, 1:] > small[:, :-1]).ravel()
+        return cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _distance(self, signature) -> float:
+        if self.method == "phash":
+            return float(np.count_nonzero(signature != self._reference))
+        return float(np.mean(np.abs(signature - self._reference))) / 255.0
+
+    def is_keyframe(self, frame: np.ndarray) -> bool:
+        signature = self._signature(frame)
+        if (self._reference is None or self._since_keyframe >= self.max_interval
+                or self._distance(signature) > self.threshold):
+            self._reference = signature
+            self._since_keyframe = 1
+            self.keyframes += 1
+            return True
+        self._since_keyframe += 1
+        self.reused += 1
+        return False
+
+    def stats(self) -> dict:
+        total = self.keyframes + self.reused
+        return {
+            "diff_method": self.method,
+            "diff_threshold": self.threshold,
+            "keyframes": self.keyframes,
+            "reused_frames": self.reused,
+            "skip_ratio": self.reused / total if total else 0.0,
+        }
+
+
+def colorize_video(input_path: str, output_path: str, batch_size: int = VIDEO_BATCH_SIZE,
+                   queue_size: int = VIDEO_QUEUE_SIZE, mode: str = VIDEO_COLORIZE_MODE,
+                   predict_batch=None, progress=None, reuse: bool = VIDEO_REUSE,
+                   differ: FrameDiffer = None) -> dict:
+    """
+    Colorize a video file frame by frame and write the result to output_path.
+    Frames are decoded by a producer thread, run through the generator in batches on the calling
+    thread, and encoded by a consumer thread. Both hand-offs use bounded queues, so memory stays
+    flat no matter how long the video is.
+    With reuse enabled, only keyframes (see FrameDiffer) go through the model; the frames in between
+    take the chroma of the last keyframe's prediction and their own full-resolution luminance.
+    `progress`, if given, is called with (frames_done, total_frames).
+    """
+    predict_batch = predict_batch or registry.predict
+    if reuse and differ is None:
+        differ = FrameDiffer(threshold=VIDEO_DIFF_THRESHOLD)
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {input_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        cap.release()
+        raise ValueError(f"Could not open video writer for {output_path}")
+
+    print(f"Colorizing video: {input_path} ({width}x{height}, {fps} FPS, {total_frames} frames)")
+    start_time = time.time()
+    decoded = queue.Queue(maxsize=queue_size)
+    colorized = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    written = [0]
+
+    def produce():
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if not _put(decoded, frame, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(decoded, _END, stop)
+
+    def consume():
+        try:
+            while True:
+                frame = _get(colorized, stop)
+                if frame is _END:
+                    break
+                writer.write(frame)
+                written[0] += 1
+                if progress:
+                    progress(written[0], total_frames)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    producer = threading.Thread(target=produce, name="video-decode", daemon=True)
+    consumer = threading.Thread(target=consume, name="video-encode", daemon=True)
+    producer.start()
+    consumer.start()
+
+    # Frames waiting for their keyframe's prediction, in output order: (frame, keyframe index, is keyframe).
+    # Index -1 refers to the last keyframe of the previous batch.
+    pending = []
+    keyframes = []
+    last_prediction = None
+
+    def flush():
+        nonlocal last_prediction
+        predictions = predict_batch(np.stack([prepare_input(frame) for frame in keyframes])) if keyframes else []
+        for frame, index, is_keyframe in pending:
+            prediction = predictions[index] if index >= 0 else last_prediction
+            if is_keyframe:
+                output = finish_prediction(frame, prediction, mode)
+            else:
+                output = transfer_chroma(frame, prediction)
+            if not _put(colorized, to_uint8(output), stop):
+                break
+        if keyframes:
+            last_prediction = predictions[-1]
+        pending.clear()
+        keyframes.clear()
+
+    try:
+        while not stop.is_set():
+            frame = _get(decoded, stop)
+            if frame is _END:
+                break
+            is_keyframe = differ is None or differ.is_keyframe(frame)
+            if is_keyframe:
+                keyframes.append(frame)
+            pending.append((frame, len(keyframes) - 1, is_keyframe))
+            # Run a batch once it is full, or once enough reused frames are buffered behind it
+            if len(keyframes) >= batch_size or len(pending) >= max(batch_size, queue_size):
+                flush()
+        if not stop.is_set():
+            flush()
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(colorized, _END, stop)
+        consumer.join()
+        stop.set()
+        producer.join()
+        cap.release()
+        writer.release()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.time() - start_time
+    stats = {
+        "frames": written[0],
+        "total_frames": total_frames,
+        "fps": fps,
+        "seconds": elapsed,
+        "throughput_fps": written[0] / elapsed if elapsed > 0 else 0.0,
+    }
+    if differ is not None:
+        stats.update(differ.stats())
+    print(f"Finished colorizing {input_path}: {stats}")
+    return stats
+
+
+class VideoJobManager:
+    """
+    Runs video colorization jobs in the background and keeps their status in memory.
+    Finished jobs are kept for retention_seconds (at most max_finished of them), then dropped
+    together with their output file; failed jobs drop their partial output right away.
+    """
+
+    def __init__(self, max_workers: int = VIDEO_JOB_WORKERS, retention_seconds: float = VIDEO_JOB_RETENTION_SECONDS,
+                 max_finished: int = VIDEO_MAX_FINISHED_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="video-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.retention_seconds = max(0.0, retention_seconds)
+        self.max_finished = max(0, max_finished)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"Error removing {path}: {str(e)}")
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, input_path: str, output_path: str):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def progress(done, total):
+            self._update(job_id, frames_done=done, total_frames=total)
+
+        try:
+            stats = colorize_video(input_path, output_path, progress=progress)
+            self._update(job_id, status="completed", finished_at=time.time(), stats=stats)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+            self._remove(output_path)
+        finally:
+            self._remove(input_path)
+
+    def prune(self):
+        """
+        Drop finished jobs past the retention period or beyond max_finished, and delete their outputs.
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.get("finished_at") is not None),
+                              key=lambda job: job["finished_at"])
+            excess = len(finished) - self.max_finished
+            expired = [job for index, job in enumerate(finished) if index < excess or job["finished_at"] < cutoff]
+            for job in expired:
+                del self._jobs[job["job_id"]]
+        for job in expired:
+            self._remove(job["output_path"])
+        if expired:
+            print(f"Removed {len(expired)} finished video job(s)")
+
+    def remove_stale_files(self, root: str, own_dir: str):
+        """
+        Delete files under root that were left behind by other server processes (or a previous run),
+        e.g. after a crash. Each process keeps its jobs' files in its own subdirectory (own_dir), which
+        is skipped; elsewhere only files untouched for VIDEO_JOB_TIMEOUT_SECONDS are removed, since a
+        running job of another live process keeps writing its output.
+        """
+        if not os.path.isdir(root):
+            return
+        cutoff = time.time() - VIDEO_JOB_TIMEOUT_SECONDS
+        own_dir = os.path.abspath(own_dir)
+        with self._lock:
+            in_use = {os.path.abspath(path) for job in self._jobs.values()
+                      for path in (job["input_path"], job["output_path"])}
+        for directory, subdirectories, files in os.walk(root, topdown=True):
+            subdirectories[:] = [name for name in subdirectories if os.path.abspath(os.path.join(directory, name)) != own_dir]
+            for name in files:
+                path = os.path.abspath(os.path.join(directory, name))
+                try:
+                    stale = os.stat(path).st_mtime < cutoff
+                except OSError:
+                    continue
+                if stale and path not in in_use:
+                    self._remove(path)
+            if directory != root and not os.listdir(directory):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    def submit(self, input_path: str, output_path: str) -> dict:
+        self.prune()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "input_path": input_path,
+            "output_path": output_path,
+            "frames_done": 0,
+            "total_frames": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job_id, input_path, output_path)
+        return dict(job)
+
+    def get(self, job_id: str):
+        self.prune()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+
+video_jobs = VideoJobManager()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Colorize a video with the generator")
+    parser.add_argument("input", help="Path of the video to colorize")
+    parser.add_argument("output", help="Path of the colorized .mp4 to write")
+    parser.add_argument("--batch-size", type=int, default=VIDEO_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=VIDEO_QUEUE_SIZE)
+    parser.add_argument("--mode", choices=["resize", "lab"], default=VIDEO_COLORIZE_MODE)
+    parser.add_argument("--no-reuse", action="store_true", help="Run every frame through the model")
+    parser.add_argument("--diff-method", choices=["luma", "phash"], default=VIDEO_DIFF_METHOD)
+    parser.add_argument("--diff-threshold", type=float, default=VIDEO_DIFF_THRESHOLD)
+    parser.add_argument("--keyframe-interval", type=int, default=VIDEO_KEYFRAME_INTERVAL)
+    args = parser.parse_args()
+    differ = None if args.no_reuse else FrameDiffer(args.diff_method, args.diff_threshold, args.keyframe_interval)
+    colorize_video(args.input, args.output, batch_size=args.batch_size, queue_size=args.queue_size,
+                   mode=args.mode, reuse=not args.no_reuse, differ=differ)
@@ -0,0 +1,81 @@
+"""
+Finds the throughput-optimal inference layout for this host: every combination of worker processes x
+intra-op threads per worker x batch size is started as an InferenceWorkerPool and kept busy with one
+batch in flight per worker, the way the batch scheduler drives it.
+
+    python API/Model/worker_benchmark.py --weights generator_fp16.tflite [--workers 1 2 4] [--threads 1 2 4] [--batch-sizes 1 4 8]
+
+Layouts that need more threads than CPUs are skipped unless --oversubscribe is given. The best row's
+settings go into .env as INFERENCE_WORKERS, INFERENCE_INTRA_OP_THREADS and INFERENCE_MAX_BATCH_SIZE.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Model.registry import DEFAULT_WEIGHTS_PATH
+from Model.workers import InferenceWorkerPool, available_cpus, numa_nodes, SIZE
+
+
+def run_layout(weights_path: str, workers: int, threads: int, batch_size: int, images: int) -> dict:
+    pool = InferenceWorkerPool(weights_path, workers, intra_op_threads=threads, max_batch_size=batch_size).start()
+    try:
+        batch = np.random.default_rng(0).random((batch_size, SIZE, SIZE, 3), dtype=np.float32)
+        # One warm-up batch per worker, in parallel so every worker gets one
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: pool(batch), range(workers)))
+
+        def timed(_):
+            start = time.perf_counter()
+            pool(batch)
+            return time.perf_counter() - start
+
+        batches = max(workers, -(-images // batch_size))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            latencies = list(executor.map(timed, range(batches)))
+        wall = time.perf_counter() - start
+    finally:
+        pool.close()
+    return {
+        "images_per_second": batches * batch_size / wall,
+        "p50_batch_ms": statistics.median(latencies) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inference throughput for workers x threads x batch size")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS_PATH, help="Keras weights or an exported artifact")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--images", type=int, default=64, help="Images per layout")
+    parser.add_argument("--oversubscribe", action="store_true")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    print(f"{len(cpus)} CPUs in {len(numa_nodes(cpus))} NUMA node(s), weights {args.weights}")
+    print(f"{'workers':>7} {'threads':>7} {'batch':>5} {'images/s':>9} {'p50 batch (ms)':>15}")
+    results = []
+    for workers in args.workers:
+        for threads in args.threads:
+            if workers * threads > len(cpus) and not args.oversubscribe:
+                continue
+            for batch_size in args.batch_sizes:
+                try:
+                    result = run_layout(args.weights, workers, threads, batch_size, args.images)
+                except Exception as e:
+                    print(f"{workers:>7} {threads:>7} {batch_size:>5} failed: {str(e)}")
+                    continue
+                results.append((result["images_per_second"], workers, threads, batch_size))
+                print(f"{workers:>7} {threads:>7} {batch_size:>5} {result['images_per_second']:>9.2f} "
+                      f"{result['p50_batch_ms']:>15.1f}")
+
+    if results:
+        _, workers, threads, batch_size = max(results)
+        print(f"Best layout: INFERENCE_WORKERS={workers} INFERENCE_INTRA_OP_THREADS={threads} "
+              f"INFERENCE_MAX_BATCH_SIZE={batch_size}")
@@ -0,0 +1,347 @@
+"""
+Inference worker processes, so the generator's thread pools don't oversubscribe a many-core host.
+
+Each worker is a spawned process pinned to its own CPU set (os.sched_setaffinity) that builds the model
+with TensorFlow's intra-op and inter-op parallelism set explicitly. Frames are handed over in a shared-memory
+FrameRing (Concurrency/shm_ring.py): the API process writes uint8 frames into ring slots and only sends
+the slot indices to an idle worker over a pipe, and the worker writes its predictions back into the same
+slots, so image tensors are never pickled.
+
+Enabled with INFERENCE_WORKERS > 0; ModelRegistry then serves predictions from an InferenceWorkerPool.
+worker_benchmark.py measures throughput for each layout of workers x threads x batch size.
+"""
+import glob
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Concurrency.shm_ring import FrameRing, FrameSlot
+except ImportError:
+    try:
+        # Try relative import
+        from ..Concurrency.shm_ring import FrameRing, FrameSlot
+    except (ImportError, ValueError):
+        # Direct import when run from the API directory
+        from Concurrency.shm_ring import FrameRing, FrameSlot
+
+SIZE = 256
+# 0 runs the model in the API process, as before
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# 0 gives each worker as many intra-op threads as CPUs in its set
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0"))
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "1"))
+INFERENCE_PIN_WORKERS = os.getenv("INFERENCE_PIN_WORKERS", "1") == "1"
+# Explicit CPU sets separated by semicolons, e.g. "0-7;8-15", overriding the automatic plan
+INFERENCE_CPU_SETS = os.getenv("INFERENCE_CPU_SETS", "")
+INFERENCE_WORKER_START_TIMEOUT = float(os.getenv("INFERENCE_WORKER_START_TIMEOUT", "300"))
+# Same setting as batching.py: the largest batch a worker is sent
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+# Frame slots shared by all workers; 0 sizes the ring for two full batches per worker
+INFERENCE_RING_SLOTS = int(os.getenv("INFERENCE_RING_SLOTS", "0"))
+# How long a request waits for a free slot before it's rejected with a 503
+INFERENCE_RING_WAIT_SECONDS = float(os.getenv("INFERENCE_RING_WAIT_SECONDS", "5"))
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """
+    Parse a kernel CPU list such as "0-3,8,10-11".
+    """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes(cpus: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    The usable CPUs grouped by NUMA node, from /sys. A single group when the topology isn't exposed.
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    usable = set(cpus)
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist"),
+                       key=lambda p: int(os.path.basename(os.path.dirname(p))[4:])):
+        try:
+            with open(path) as f:
+                node = [cpu for cpu in parse_cpu_list(f.read()) if cpu in usable]
+        except (OSError, ValueError):
+            continue
+        if node:
+            nodes.append(node)
+    covered = {cpu for node in nodes for cpu in node}
+    if not nodes or covered != usable:
+        return [sorted(usable)]
+    return nodes
+
+
+def plan_cpu_sets(workers: int, cpus: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    Split the usable CPUs into one disjoint set per worker. CPUs are ordered node by node and split
+    into contiguous runs, so a worker's set stays within one NUMA node whenever the counts allow it.
+    With more workers than CPUs, workers share CPUs round-robin.
+    """
+    if INFERENCE_CPU_SETS and cpus is None:
+        sets = [parse_cpu_list(part) for part in INFERENCE_CPU_SETS.split(";") if part.strip()]
+        return [sets[i % len(sets)] for i in range(workers)]
+    ordered = [cpu for node in numa_nodes(cpus) for cpu in node]
+    if workers >= len(ordered):
+        return [[ordered[i % len(ordered)]] for i in range(workers)]
+    return [[int(cpu) for cpu in chunk] for chunk in np.array_split(ordered, workers)]
+
+
+def _worker_main(index: int, weights_path: str, cpus: List[int], intra_op_threads: int,
+                 inter_op_threads: int, ring_name: str, ring_slots: int, conn):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # Thread settings have to be in place before TensorFlow (or the TFLite interpreter) starts its pools
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    os.environ["TFLITE_NUM_THREADS"] = str(intra_op_threads)
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        try:
+            from API.Model.registry import ModelRegistry
+        except ImportError:
+            try:
+                from .registry import ModelRegistry
+            except ImportError:
+                from registry import ModelRegistry
+        registry = ModelRegistry(weights_path, workers=0)
+        registry.load()
+        ring = FrameRing.attach(ring_name, ring_slots)
+    except Exception as e:
+        conn.send(("error", f"Worker {index} failed to start: {str(e)}"))
+        return
+
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            indices = conn.recv()
+        except EOFError:
+            break
+        if indices is None:
+            break
+        try:
+            # The frames are read where the API wrote them; normalizing them is the only conversion
+            frames = ring.frames(indices)
+            ring.write_outputs(indices, registry.predict(frames.astype(np.float32) / 255.0))
+            conn.send(("ok", len(indices)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+    ring.close()
+
+
+class _Worker:
+    __slots__ = ("index", "cpus", "process", "conn", "batches")
+
+    def __init__(self, index: int, cpus: List[int], process, conn):
+        self.index = index
+        self.cpus = cpus
+        self.process = process
+        self.conn = conn
+        self.batches = 0
+
+
+class InferenceWorkerPool:
+    """
+    A fixed set of pinned inference processes sharing one FrameRing.
+    Request paths take a slot with slot(), write their frame into it and run it with run_slots(),
+    batched together with other slots by the scheduler. The pool is also callable like the Keras model,
+    pool(batch) -> predictions, for normalized batches built in process (warm-up, video keyframes).
+    Each batch takes an idle worker (blocking until one is free), so up to `workers` batches run at once.
+    A worker that dies is restarted and its batch fails with RuntimeError. If the restart fails the pool
+    carries on with one worker fewer; once none is left, every batch fails with RuntimeError at once.
+    """
+
+    def __init__(self, weights_path: str, workers: int = INFERENCE_WORKERS,
+                 intra_op_threads: int = INFERENCE_INTRA_OP_THREADS, inter_op_threads: int = INFERENCE_INTER_OP_THREADS,
+                 max_batch_size: int = MAX_BATCH_SIZE, pin: bool = INFERENCE_PIN_WORKERS,
+                 ring_slots: int = INFERENCE_RING_SLOTS):
+        self.weights_path = weights_path
+        self.workers = max(1, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.ring_slots = max(ring_slots, self.max_batch_size) if ring_slots > 0 else 2 * self.workers * self.max_batch_size
+        self.cpu_sets = plan_cpu_sets(self.workers)
+        self.pin = pin
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = max(1, inter_op_threads)
+        self.ring = None
+        self._context = multiprocessing.get_context("spawn")
+        self._all = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _threads_for(self, cpus: List[int]) -> int:
+        return self.intra_op_threads if self.intra_op_threads > 0 else len(cpus)
+
+    def _spawn(self, index: int) -> _Worker:
+        cpus = self.cpu_sets[index]
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.weights_path, cpus if self.pin else [], self._threads_for(cpus),
+                  self.inter_op_threads, self.ring.name, self.ring.slots, child_conn),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, cpus, process, parent_conn)
+
+    def _wait_ready(self, worker: _Worker):
+        if not worker.conn.poll(INFERENCE_WORKER_START_TIMEOUT):
+            raise RuntimeError(f"Inference worker {worker.index} did not start within {INFERENCE_WORKER_START_TIMEOUT} seconds")
+        status, payload = worker.conn.recv()
+        if status != "ready":
+            raise RuntimeError(payload)
+
+    def _discard(self, worker: _Worker):
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(5)
+        worker.conn.close()
+
+    def start(self):
+        """
+        Create the frame ring, spawn every worker and wait until each has built its model.
+        """
+        start_time = time.time()
+        self.ring = FrameRing(self.ring_slots)
+        workers = [self._spawn(index) for index in range(self.workers)]
+        try:
+            for worker in workers:
+                self._wait_ready(worker)
+        except Exception:
+            for worker in workers:
+                self._discard(worker)
+            self.ring.close()
+            raise
+        with self._lock:
+            self._all = workers
+        for worker in workers:
+            self._idle.put(worker)
+        layout = ", ".join(f"{worker.index}: cpus {worker.cpus}" for worker in workers)
+        print(f"Started {self.workers} inference workers with {self.ring.slots} frame slots "
+              f"in {time.time() - start_time:.2f} seconds ({layout})")
+        return self
+
+    @property
+    def live_workers(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+    def _take_idle(self) -> _Worker:
+        worker = self._idle.get()
+        if worker is None:
+            # Put the marker back so every other waiting batch sees it too
+            self._idle.put(None)
+            raise RuntimeError("No inference workers are running")
+        return worker
+
+    def _restart(self, worker: _Worker) -> _Worker:
+        print(f"Inference worker {worker.index} died, restarting it")
+        with self._lock:
+            self._all = [w for w in self._all if w is not worker]
+        self._discard(worker)
+        replacement = self._spawn(worker.index)
+        try:
+            self._wait_ready(replacement)
+        except Exception:
+            self._discard(replacement)
+            raise
+        with self._lock:
+            self._all.append(replacement)
+        return replacement
+
+    def slot(self, timeout: Optional[float] = INFERENCE_RING_WAIT_SECONDS) -> FrameSlot:
+        """
+        Take a free frame slot; raises RingFullError (a 503) if none frees up within timeout.
+        """
+        return self.ring.acquire(timeout, owner=self)
+
+    def run_slots(self, indices: List[int]):
+        """
+        Run the frames in the given slots through the model on one worker.
+        The predictions are written into the same slots' outputs.
+        """
+        for start in range(0, len(indices), self.max_batch_size):
+            chunk = list(indices[start:start + self.max_batch_size])
+            worker = self._take_idle()
+            try:
+                worker.conn.send(chunk)
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                try:
+                    self._idle.put(self._restart(worker))
+                except Exception as e_restart:
+                    # The pool carries on with one worker fewer; with none left, waiting batches are woken to fail
+                    print(f"Could not restart inference worker {worker.index}: {str(e_restart)}")
+                    if self.live_workers == 0:
+                        self._idle.put(None)
+                raise RuntimeError(f"Inference worker {worker.index} failed: {str(e)}") from e
+            self._idle.put(worker)
+            if status != "ok":
+                raise RuntimeError(payload)
+            worker.batches += 1
+
+    def __call__(self, batch, training=False) -> np.ndarray:
+        # Normalized frames (as made by prepare_input) convert back to uint8 exactly
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        for start in range(0, len(batch), self.max_batch_size):
+            chunk = batch[start:start + self.max_batch_size]
+            slots = [self.ring.acquire(owner=self) for _ in range(len(chunk))]
+            try:
+                for slot, frame in zip(slots, chunk):
+                    slot.input[...] = np.rint(np.clip(frame, 0, 1) * 255.0)
+                self.run_slots([slot.index for slot in slots])
+                outputs.append(np.stack([slot.output for slot in slots]))
+            finally:
+                for slot in slots:
+                    slot.release()
+        return np.concatenate(outputs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            workers = [{"index": worker.index, "pid": worker.process.pid, "alive": worker.process.is_alive(),
+                        "cpus": worker.cpus, "batches": worker.batches} for worker in self._all]
+        return {"workers": workers, "ring": self.ring.stats() if self.ring is not None else {}}
+
+    def close(self):
+        """
+        Wait for slots in use to be released and in-flight batches to finish,
+        then stop every worker and free the frame ring.
+        """
+        if self.ring is not None and not self.ring.wait_idle(timeout=INFERENCE_WORKER_START_TIMEOUT):
+            print("Closing the inference workers with frame slots still in use")
+        with self._lock:
+            workers, self._all = self._all, []
+        for _ in workers:
+            worker = self._idle.get()
+            while worker is None:
+                worker = self._idle.get()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(10)
+            self._discard(worker)
+        if self.ring is not None:
+            self.ring.close()
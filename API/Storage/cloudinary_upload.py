@@ -1,9 +1,29 @@
+import abc
 import cloudinary
+import hashlib
+import mmap
 import os
+import random
+import time
+import uuid
 import cloudinary.uploader as uploader
 import cloudinary.api
+import cloudinary.exceptions
 import dotenv
-import requests
+from io import BytesIO
+from typing import BinaryIO, Dict, List, Optional, Union
+
+# Handle imports for both module usage and direct script execution
+try:
+    # When used as a module in the package
+    from API.Storage.http_client import fetch
+except ImportError:
+    try:
+        # Try relative import
+        from .http_client import fetch
+    except ImportError:
+        # Direct import when run from the Storage directory
+        from http_client import fetch
 
 dotenv.load_dotenv()
 
@@ -14,16 +34,272 @@ cloudinary.config(
     secure=True,
 )
 
-def upload_image(image_path: str):
-    if os.path.exists(image_path):
-        print(f"Uploading image: {image_path}")
-        result = uploader.upload(image_path, folder="DAT")
-        print(f"Upload successful! Image URL: {result['secure_url']}")
-        
+# "cloudinary" or "disk" (content-addressed files under STORAGE_DIR, served by the API at /storage)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary")
+STORAGE_DIR = os.getenv("STORAGE_DIR", "./storage")
+STORAGE_BASE_URL = os.getenv("STORAGE_BASE_URL", "http://localhost:8000").rstrip("/")
+STORAGE_FOLDER = os.getenv("STORAGE_FOLDER", "DAT")
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+STORAGE_RETRY_BASE_SECONDS = float(os.getenv("STORAGE_RETRY_BASE_SECONDS", "0.5"))
+
+
+class StorageBackend(abc.ABC):
+    """
+    Where image assets are stored. Backends take encoded image bytes (or a file-like object)
+    and return a URL, and delete assets by public ID (the folder-relative name without extension).
+    Exceptions listed in `non_retryable` are raised immediately instead of being retried.
+    """
+
+    non_retryable = (FileNotFoundError, ValueError, TypeError)
+
+    @abc.abstractmethod
+    def upload(self, image: BinaryIO, folder: str = STORAGE_FOLDER) -> str:
+        """
+        Store the image and return its URL.
+        """
+
+    @abc.abstractmethod
+    def delete(self, public_id: str) -> bool:
+        """
+        Delete the asset with this public ID; True if it existed.
+        """
+
+    def delete_many(self, public_ids: List[str]) -> Dict[str, bool]:
+        # Backends without a bulk call delete one by one
+        return {public_id: self.delete(public_id) for public_id in public_ids}
+
+    @abc.abstractmethod
+    def public_id(self, url: str) -> Optional[str]:
+        """
+        Public ID of the asset behind url, or None if the URL isn't from this backend.
+        """
+
+    def file_path(self, public_id: str) -> Optional[str]:
+        # Path of the stored file for backends that keep assets on local disk, None otherwise
+        return None
+
+    def local_path(self, url: str) -> Optional[str]:
+        public_id = self.public_id(url)
+        return self.file_path(public_id) if public_id else None
+
+    def content_hash(self, url: str) -> str:
+        # Remote URLs are versioned (Cloudinary puts v<timestamp> in every URL and a re-upload gets a new one),
+        # so a URL always names the same bytes and its hash identifies the content
+        return hashlib.sha256(url.encode()).hexdigest()
+
+
+class CloudinaryBackend(StorageBackend):
+    """
+    Stores assets in Cloudinary. Deletes of several assets go through the Admin API's
+    delete_resources, up to 100 public IDs per call.
+    """
+
+    non_retryable = StorageBackend.non_retryable + (
+        cloudinary.exceptions.BadRequest,
+        cloudinary.exceptions.AuthorizationRequired,
+        cloudinary.exceptions.NotAllowed,
+        cloudinary.exceptions.NotFound,
+    )
+    DELETE_BATCH_SIZE = 100
+
+    def upload(self, image: BinaryIO, folder: str = STORAGE_FOLDER) -> str:
+        return uploader.upload(image, folder=folder)["secure_url"]
+
+    def delete(self, public_id: str) -> bool:
+        result = uploader.destroy(public_id)
+        print(f"Delete result: {result}")
+        return result.get("result") == "ok"
+
+    def delete_many(self, public_ids: List[str]) -> Dict[str, bool]:
+        results = {}
+        for start in range(0, len(public_ids), self.DELETE_BATCH_SIZE):
+            batch = public_ids[start:start + self.DELETE_BATCH_SIZE]
+            deleted = cloudinary.api.delete_resources(batch).get("deleted", {})
+            print(f"Bulk delete result: {deleted}")
+            results.update({public_id: deleted.get(public_id) == "deleted" for public_id in batch})
+        return results
+
+    def public_id(self, url: str) -> Optional[str]:
+        """
+        Example: https://res.cloudinary.com/cloud_name/image/upload/v1234567890/DAT/image_name.jpg -> DAT/image_name
+        """
+        try:
+            parts = url.split('/')
+            # Find the upload part
+            upload_index = parts.index('upload')
+            # Skip the version part (v1234567890)
+            version_index = upload_index + 1
+            # Join all parts after the version, removing the file extension
+            remaining_parts = parts[version_index+1:]
+            filename_with_ext = remaining_parts[-1]
+            filename_without_ext = os.path.splitext(filename_with_ext)[0]
+            remaining_parts[-1] = filename_without_ext
+            return '/'.join(remaining_parts)
+        except (ValueError, IndexError) as e:
+            print(f"Error extracting public ID from URL {url}: {str(e)}")
+            return None
+
+
+class LocalFilesystemBackend(StorageBackend):
+    """
+    Content-addressed store on local disk, for deployments that don't want a WAN round trip per image.
+    The bytes are written once to root/.objects/<hash[:2]>/<sha256 of the bytes>, and every upload gets its
+    own hard link to that blob at root/<folder>/<hash[:2]>/<hash>-<upload id>. Identical uploads share the
+    data on disk, but deleting one upload only removes its link; the blob goes once no upload links to it
+    (the filesystem's link count is the reference count). Files never change after they are written.
+    URLs point at the API's /storage route, and inputs are read back through mmap instead of over HTTP.
+    Also works as a stand-in for Cloudinary in tests (see set_backend).
+    """
+
+    OBJECTS_DIR = ".objects"
+
+    def __init__(self, root: str = STORAGE_DIR, base_url: str = STORAGE_BASE_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, public_id: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, public_id))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid public ID: {public_id}")
+        return path
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, self.OBJECTS_DIR, digest[:2], digest)
+
+    def _write_blob(self, blob: str, content: bytes):
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial file
+        tmp_path = f"{blob}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, blob)
+
+    def upload(self, image: BinaryIO, folder: str = STORAGE_FOLDER) -> str:
+        content = image.getvalue() if isinstance(image, BytesIO) else image.read()
+        digest = hashlib.sha256(content).hexdigest()
+        public_id = f"{folder}/{digest[:2]}/{digest}-{uuid.uuid4().hex[:12]}"
+        path = self._path(public_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob = self._blob_path(digest)
+        for _ in range(2):
+            if not os.path.exists(blob):
+                self._write_blob(blob, content)
+            try:
+                os.link(blob, path)
+                break
+            except FileNotFoundError:
+                # The last upload of the same bytes was deleted in between; write the blob again
+                continue
+            except OSError:
+                # No hard links on this filesystem: the upload gets its own copy
+                self._write_blob(path, content)
+                break
+        else:
+            # The blob kept being deleted under us; store this upload's own copy rather than a dangling URL
+            self._write_blob(path, content)
+        return f"{self.base_url}/storage/{public_id}"
+
+    def delete(self, public_id: str) -> bool:
+        path = self._path(public_id)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        digest = os.path.basename(path).split("-", 1)[0]
+        blob = self._blob_path(digest)
+        try:
+            # Only the blob itself is left: no other upload uses these bytes
+            if os.stat(blob).st_nlink <= 1:
+                os.remove(blob)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def public_id(self, url: str) -> Optional[str]:
+        prefix = self.base_url + "/storage/"
+        if not url.startswith(prefix):
+            return None
+        return url[len(prefix):]
+
+    def content_hash(self, url: str) -> str:
+        # The file name starts with the SHA-256 of its bytes
+        public_id = self.public_id(url)
+        return public_id.rsplit("/", 1)[-1].split("-", 1)[0] if public_id else super().content_hash(url)
+
+    def file_path(self, public_id: str) -> Optional[str]:
+        try:
+            path = self._path(public_id)
+        except ValueError:
+            return None
+        return path if os.path.isfile(path) else None
+
+
+def create_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    if name == "cloudinary":
+        return CloudinaryBackend()
+    if name == "disk":
+        return LocalFilesystemBackend(STORAGE_DIR, STORAGE_BASE_URL)
+    raise ValueError(f"Unknown storage backend: {name} (expected 'cloudinary' or 'disk')")
+
+
+backend: StorageBackend = create_backend()
+
+
+def set_backend(new_backend: StorageBackend):
+    """
+    Replace the storage backend used by the module-level functions, e.g. with a LocalFilesystemBackend in tests.
+    """
+    global backend
+    backend = new_backend
+
+
+def with_retries(fn, *args, attempts: Optional[int] = None, base_delay: Optional[float] = None):
+    """
+    Call fn(*args), retrying failures with exponential backoff and jitter.
+    Errors the backend marks as non-retryable are raised on the first attempt.
+    """
+    attempts = STORAGE_RETRIES if attempts is None else attempts
+    base_delay = STORAGE_RETRY_BASE_SECONDS if base_delay is None else base_delay
+    for attempt in range(1, max(1, attempts) + 1):
+        try:
+            return fn(*args)
+        except backend.non_retryable:
+            raise
+        except Exception as e:
+            if attempt >= attempts:
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            print(f"Storage call {getattr(fn, '__name__', fn)} failed (attempt {attempt}/{attempts}), retrying in {delay:.2f}s: {str(e)}")
+            time.sleep(delay)
+
+
+def upload_image(image: Union[str, bytes, BinaryIO]):
+    """
+    Uploads an image to the configured storage backend (Cloudinary by default) and returns its URL.
+    The image can be a file path, raw bytes or a file-like object, so callers can
+    stream encoded buffers straight to storage without writing temp files.
+    """
+    if isinstance(image, str):
+        if not os.path.exists(image):
+            print(f"File does not exist: {image}")
+            raise FileNotFoundError(f"File does not exist: {image}")
+        print(f"Uploading image: {image}")
+        with open(image, "rb") as f:
+            content = f.read()
+    elif isinstance(image, (bytes, bytearray, memoryview)):
+        content = image
+        print("Uploading image from memory")
     else:
-        print(f"File does not exist: {image_path}")
+        content = image.read()
+        print("Uploading image from memory")
+
+    def upload():
+        # Each attempt gets a fresh stream, since a failed attempt may have consumed the previous one
+        return backend.upload(BytesIO(content))
 
-    return result["secure_url"]
+    url = with_retries(upload)
+    print(f"Upload successful! Image URL: {url}")
+    return url
 
 def delete_image_from_cloudinary(public_id: str):
     """
@@ -33,43 +309,82 @@ def delete_image_from_cloudinary(public_id: str):
     """
     try:
         print(f"Deleting image with public ID: {public_id}")
-        result = uploader.destroy(public_id)
-        print(f"Delete result: {result}")
-        return result.get("result") == "ok"
+        return with_retries(backend.delete, public_id)
     except Exception as e:
         print(f"Error deleting image from Cloudinary: {str(e)}")
         return False
 
+def delete_images_from_cloudinary(public_ids: List[str]) -> Dict[str, bool]:
+    """
+    Deletes several images at once (one delete_resources call per 100 images on Cloudinary).
+    Returns a dict mapping each public ID to whether it was deleted.
+    """
+    public_ids = list(dict.fromkeys(public_id for public_id in public_ids if public_id))
+    if not public_ids:
+        return {}
+    try:
+        print(f"Deleting images with public IDs: {public_ids}")
+        return with_retries(backend.delete_many, public_ids)
+    except Exception as e:
+        print(f"Error deleting images from Cloudinary: {str(e)}")
+        return {public_id: False for public_id in public_ids}
+
 def extract_public_id_from_url(url: str):
     """
     Extracts the public ID from a Cloudinary URL.
     Example: https://res.cloudinary.com/cloud_name/image/upload/v1234567890/DAT/image_name.jpg -> DAT/image_name
     """
-    try:
-        parts = url.split('/')
-        # Find the upload part
-        upload_index = parts.index('upload')
-        # Skip the version part (v1234567890)
-        version_index = upload_index + 1
-        # Join all parts after the version, removing the file extension
-        remaining_parts = parts[version_index+1:]
-        filename_with_ext = remaining_parts[-1]
-        filename_without_ext = os.path.splitext(filename_with_ext)[0]
-        remaining_parts[-1] = filename_without_ext
-        return '/'.join(remaining_parts)
-    except (ValueError, IndexError) as e:
-        print(f"Error extracting public ID from URL {url}: {str(e)}")
-        return None
+    return backend.public_id(url)
+
+def read_file(path: str):
+    """
+    Map a stored file into memory instead of reading it into a new buffer.
+    The result is bytes-like and file-like, so it can be handed straight to the decoder.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 def retrive_image(image_url: str):
-    response = requests.get(image_url)
-    return response.content
+    # Assets on local disk are memory-mapped; anything else goes through the shared HTTP client
+    path = backend.local_path(image_url)
+    if path:
+        return read_file(path)
+    return fetch(image_url)
 
-def save_image(image_url: str, image_name: str):
-    image = retrive_image(image_url)
-    with open(image_name, "wb") as f:
-        f.write(image)
+def stored_file(public_id: str) -> Optional[str]:
+    """
+    Path of a locally stored asset, or None if the backend doesn't keep it on this disk.
+    """
+    return backend.file_path(public_id)
 
+def local_asset_path(url: str) -> Optional[str]:
+    return backend.local_path(url)
 
+def content_hash(url: str) -> str:
+    """
+    Hash identifying the bytes behind a stored asset URL, used for strong ETags.
+    """
+    return backend.content_hash(url)
 
+def media_type(path: str) -> str:
+    # Stored files have no extension, so sniff the image format from its first bytes
+    with open(path, "rb") as f:
+        header = f.read(12)
+    if header.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:3] == b"GIF":
+        return "image/gif"
+    if header[:2] == b"BM":
+        return "image/bmp"
+    return "application/octet-stream"
 
+def save_image(image_url: str, image_name: str):
+    image = retrive_image(image_url)
+    with open(image_name, "wb") as f:
+        f.write(image)
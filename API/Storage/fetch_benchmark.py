@@ -0,0 +1,143 @@
+"""
+Measures source image fetch latency on its own, without inference, against a local HTTP stand-in
+for res.cloudinary.com.
+
+LocalImageServer serves a fixed payload over HTTP/1.1 keep-alive and can add a delay per new
+connection (standing in for the TCP + TLS handshake) and per request (round-trip time).
+The benchmark compares the old bare requests.get() with the shared HTTPFetcher, sequentially and
+with several downloads in flight:
+
+    python API/Storage/fetch_benchmark.py [--requests 200] [--size 300000] [--connect-ms 30] [--rtt-ms 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Storage.http_client import HTTPFetcher
+
+
+class LocalImageServer:
+    """
+    Threaded HTTP server on 127.0.0.1 that answers every GET with `payload`.
+    Use as a context manager; `url(name)` gives the address of an image.
+    """
+
+    def __init__(self, payload: bytes, connect_delay: float = 0.0, request_delay: float = 0.0):
+        self.payload = payload
+        self.connections = 0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+                time.sleep(connect_delay)
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(request_delay)
+                body, status = server.payload, 200
+                # Single byte ranges, like the CDN, so range forwarding can be exercised too
+                http_range = self.headers.get("Range", "")
+                if http_range.startswith("bytes=") and "," not in http_range:
+                    first, _, last = http_range[6:].partition("-")
+                    if first:
+                        start, end = int(first), min(int(last), len(body) - 1) if last else len(body) - 1
+                    else:
+                        # Suffix range: the last N bytes
+                        start, end = max(0, len(body) - int(last)), len(body) - 1
+                    body, status = body[start:end + 1], 206
+                self.send_response(status)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.payload)}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def url(self, name: str = "image.jpg") -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/DAT/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def bare_fetch(url: str) -> bytes:
+    # What Gen_Image and retrive_image used to do
+    return requests.get(url).content
+
+
+def timed(fetch, url: str) -> float:
+    start = time.perf_counter()
+    body = fetch(url)
+    elapsed = time.perf_counter() - start
+    if not len(body):
+        raise RuntimeError(f"Empty body from {url}")
+    return elapsed
+
+
+def run_sequential(fetch, urls) -> list:
+    return [timed(fetch, url) for url in urls]
+
+
+def run_concurrent(fetcher: HTTPFetcher, urls, concurrency: int) -> list:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda url: timed(fetcher.fetch, url), urls))
+
+
+def report(name: str, latencies: list, wall: float, server: LocalImageServer, connections_before: int):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<28} {statistics.median(latencies) * 1000:>9.2f} {p95 * 1000:>9.2f} "
+          f"{len(latencies) / wall:>10.1f} {server.connections - connections_before:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark source image fetching against a local HTTP server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size", type=int, default=300_000, help="Payload size in bytes")
+    parser.add_argument("--connect-ms", type=float, default=30.0, help="Delay per new connection (handshake)")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Delay per request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    with LocalImageServer(payload, args.connect_ms / 1000, args.rtt_ms / 1000) as server:
+        urls = [server.url(f"image_{i}.jpg") for i in range(args.requests)]
+        fetcher = HTTPFetcher(pool_size=args.concurrency, max_concurrency=args.concurrency)
+        print(f"{args.requests} requests of {args.size} bytes, {args.connect_ms} ms per connection, {args.rtt_ms} ms per request")
+        print(f"{'Client':<28} {'p50 (ms)':>9} {'p95 (ms)':>9} {'images/s':>10} {'connections':>12}")
+
+        for name, run in (
+            ("requests.get (sequential)", lambda: run_sequential(bare_fetch, urls)),
+            ("HTTPFetcher (sequential)", lambda: run_sequential(fetcher.fetch, urls)),
+            (f"HTTPFetcher ({args.concurrency} in flight)", lambda: run_concurrent(fetcher, urls, args.concurrency)),
+        ):
+            connections_before = server.connections
+            start = time.perf_counter()
+            latencies = run()
+            report(name, latencies, time.perf_counter() - start, server, connections_before)
+        fetcher.close()
@@ -0,0 +1,107 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Kept connections per host; should cover the number of threads fetching at once
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "16"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_MAX_DOWNLOAD_BYTES = int(os.getenv("HTTP_MAX_DOWNLOAD_BYTES", str(25 * 1024 * 1024)))
+HTTP_CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    """
+    Raised when a URL can't be downloaded: HTTP error status, timeout, oversized or truncated body.
+    """
+
+
+class HTTPFetcher:
+    """
+    Downloads source images over one shared requests.Session, so connections (and TLS sessions)
+    to res.cloudinary.com are kept alive and reused instead of being opened for every image.
+    At most max_concurrency downloads run at once; bodies larger than max_bytes are rejected
+    before they are read. When the server sends Content-Length, the body is read straight into
+    a buffer of that size.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, max_concurrency: int = HTTP_MAX_CONCURRENCY,
+                 timeout: tuple = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries: int = HTTP_RETRIES,
+                 max_bytes: int = HTTP_MAX_DOWNLOAD_BYTES):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def _read_body(self, response: requests.Response, url: str) -> bytearray:
+        length = response.headers.get("Content-Length")
+        if length is not None and int(length) > self.max_bytes:
+            raise FetchError(f"{url} is {int(length)} bytes, more than the {self.max_bytes} byte limit")
+
+        if length is not None and not response.headers.get("Content-Encoding"):
+            # Known size: read the raw stream directly into a preallocated buffer
+            buffer = bytearray(int(length))
+            view = memoryview(buffer)
+            position = 0
+            while position < len(buffer):
+                read = response.raw.readinto(view[position:position + HTTP_CHUNK_SIZE])
+                if not read:
+                    break
+                position += read
+            if position != len(buffer):
+                raise FetchError(f"{url} ended after {position} of {len(buffer)} bytes")
+            return buffer
+
+        # Unknown or compressed size: grow the buffer chunk by chunk up to the limit
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) > self.max_bytes:
+                raise FetchError(f"{url} is larger than the {self.max_bytes} byte limit")
+        return buffer
+
+    def fetch(self, url: str) -> bytearray:
+        """
+        Download url and return its body. Raises FetchError on failure.
+        """
+        with self._slots:
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code >= 400:
+                        raise FetchError(f"GET {url} returned HTTP {response.status_code}")
+                    return self._read_body(response, url)
+            except requests.RequestException as e:
+                raise FetchError(f"GET {url} failed: {str(e)}") from e
+
+    def stream(self, url: str, headers: dict = None) -> requests.Response:
+        """
+        Open a streamed GET on the shared session for proxying the body chunk by chunk.
+        Upstream 206 and 416 responses are returned as-is; the caller must close the response.
+        """
+        try:
+            response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise FetchError(f"GET {url} failed: {str(e)}") from e
+        if response.status_code >= 400 and response.status_code != 416:
+            response.close()
+            raise FetchError(f"GET {url} returned HTTP {response.status_code}")
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+fetcher = HTTPFetcher()
+
+
+def fetch(url: str) -> bytearray:
+    return fetcher.fetch(url)
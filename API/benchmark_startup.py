@@ -0,0 +1,57 @@
+"""
+Measures how long it takes to import each API module in a fresh interpreter.
+
+Each module is imported in its own subprocess (so nothing is cached between measurements),
+several times, and the best time is reported. Run it from anywhere:
+
+    python API/benchmark_startup.py [--repeat 3] [module ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules imported by main.py, in dependency order, followed by main itself
+DEFAULT_MODULES = [
+    "Concurrency.pools",
+    "Database.models",
+    "Database.async_repository",
+    "Storage.cloudinary_upload",
+    "Model.registry",
+    "Model.batching",
+    "Model.inference",
+    "Model.video",
+    "main",
+]
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def time_import(module: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import time of the API modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'Module':<28} {'Best (ms)':>10}")
+    for module in args.modules:
+        try:
+            best = min(time_import(module) for _ in range(max(1, args.repeat)))
+            print(f"{module:<28} {best * 1000:>10.1f}")
+        except Exception as e:
+            print(f"{module:<28} {'error':>10}  {str(e)}")
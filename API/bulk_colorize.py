@@ -0,0 +1,53 @@
+"""
+Colorize many stored images through the API's bulk endpoint and print progress as it streams in.
+
+    python API/bulk_colorize.py --uncolorized
+    python API/bulk_colorize.py --ids 65f1... 65f2...
+    python API/bulk_colorize.py --filter '{"title": "family"}' --limit 200
+
+Exits with a non-zero status if any image failed.
+"""
+import argparse
+import json
+import os
+import sys
+import requests
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+
+def bulk_colorize(api_url: str, ids=None, query=None, limit=None) -> dict:
+    body = {"ids": ids} if ids else {"filter": query}
+    if limit:
+        body["limit"] = limit
+    summary = {}
+    with requests.post(f"{api_url}/images/colorize/bulk", json=body, stream=True, timeout=(10, None)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["status"] == "finished":
+                summary = event
+            elif event["status"] == "colorized":
+                print(f"[{event['done']}/{event['total']}] {event['image_id']}: {event['colorized_cloudinary_url']}")
+            else:
+                print(f"[{event['done']}/{event['total']}] {event['image_id']}: failed ({event['error']})")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk colorize stored images")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--ids", nargs="+", help="IDs of the images to colorize")
+    group.add_argument("--filter", help="Filter on colorized, title or description as JSON, e.g. '{\"colorized\": false}'")
+    group.add_argument("--uncolorized", action="store_true", help="Colorize every image that isn't colorized yet")
+    parser.add_argument("--limit", type=int, help="Maximum number of images to colorize")
+    parser.add_argument("--api-url", default=API_URL)
+    args = parser.parse_args()
+
+    query = {"colorized": False} if args.uncolorized else (json.loads(args.filter) if args.filter else None)
+    summary = bulk_colorize(args.api_url, ids=args.ids, query=query, limit=args.limit)
+    print(f"Colorized {summary.get('colorized', 0)} of {summary.get('total', 0)} images "
+          f"({summary.get('failed', 0)} failed, {summary.get('updated', 0)} documents updated)")
+    sys.exit(1 if summary.get("failed") or not summary else 0)
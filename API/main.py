@@ -1,30 +1,107 @@
-from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Form, Query, Request, Response, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 import uvicorn
+from contextlib import asynccontextmanager
+import shutil
+import asyncio
+import hashlib
+import hmac
+import json
 import os
+import socket
+import time
 from pydantic import BaseModel
 from Storage.cloudinary_upload import upload_image as upload_to_cloudinary
-from Storage.cloudinary_upload import delete_image_from_cloudinary, extract_public_id_from_url, save_image
-from Model.inference import Gen_Image
-from Database.database import (
-    ImageBase,
-    ImageCreate,
-    ImageResponse,
-    get_all_images,
-    get_image_by_id,
-    create_image,
-    update_image,
-    delete_image
-)
+from Storage.cloudinary_upload import delete_images_from_cloudinary, extract_public_id_from_url
+from Storage.cloudinary_upload import retrive_image, stored_file, media_type, local_asset_path, content_hash
+from Storage.http_client import fetcher, FetchError, HTTP_CHUNK_SIZE
+from Model.inference import decode_image, colorize_array, encode_image, image_extension, COLORIZE_MODE
+from Model.cache import result_cache, image_key
+from Model.derivatives import build_derivatives, DERIVATIVE_NAMES
+from Model.video import video_jobs
+from Model.registry import registry
+from Model.batching import scheduler
+from Concurrency.pools import PoolSaturatedError, run_inference, run_io, pool_stats, shutdown_pools, INFERENCE_POOL_SIZE
+from Database.models import ImageCreate
+from Database.async_repository import repository
+from Jobs.job_queue import JobQueue, TERMINAL_STATES
 import tempfile
+from bson import ObjectId
 import numpy as np
-from PIL import Image
 import uuid
 import cv2
 
-app = FastAPI(title="Image Colorization API")
+# Errors from the background warm-up tasks, reported by GET /ready
+startup_errors = {}
+
+# Colorization jobs are stored in MongoDB and processed by background workers
+# A saturated pool (or frame ring) defers a job instead of using up one of its attempts
+job_queue = JobQueue(repository, transient_errors=(PoolSaturatedError,))
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))
+
+# Images colorized at once by the bulk endpoint; enough concurrent callers let the scheduler fill its batches
+BULK_COLORIZE_CONCURRENCY = int(os.getenv("BULK_COLORIZE_CONCURRENCY", str(INFERENCE_POOL_SIZE)))
+BULK_COLORIZE_MAX_IMAGES = int(os.getenv("BULK_COLORIZE_MAX_IMAGES", "1000"))
+# Finished images are written to the database in chunks of this size
+BULK_COLORIZE_WRITE_BATCH = max(1, int(os.getenv("BULK_COLORIZE_WRITE_BATCH", "50")))
+# How long an image waits for a saturated pool to free up before it is reported as failed
+BULK_COLORIZE_SATURATED_WAIT_SECONDS = float(os.getenv("BULK_COLORIZE_SATURATED_WAIT_SECONDS", "60"))
+BULK_COLORIZE_RETRY_BASE_SECONDS = 0.25
+
+# /model/reload only loads files (or SavedModel directories) directly inside this directory,
+# and only for callers presenting ADMIN_TOKEN in X-Admin-Token; without a token it is disabled
+MODEL_WEIGHTS_DIR = os.path.realpath(os.getenv("MODEL_WEIGHTS_DIR", os.path.dirname(registry.weights_path) or "."))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Where uploaded videos and colorized outputs are kept while video jobs run; each server process
+# works in its own subdirectory so processes sharing the directory never clean up each other's jobs
+VIDEO_WORK_DIR = os.getenv("VIDEO_WORK_DIR", os.path.join(tempfile.gettempdir(), "colorization_videos"))
+VIDEO_PROCESS_DIR = os.path.join(VIDEO_WORK_DIR, f"{socket.gethostname()}-{os.getpid()}")
+
+async def warm_model():
+    try:
+        # Build the generator once per process so requests reuse a warm instance
+        await run_inference(registry.load)
+        scheduler.start()
+        startup_errors.pop("model", None)
+    except Exception as e:
+        print(f"Error warming up the model: {str(e)}")
+        startup_errors["model"] = str(e)
+
+async def connect_database():
+    # The job workers don't depend on the startup connection: the repository reconnects lazily
+    # and the workers keep polling until the database is reachable
+    await job_queue.start()
+    try:
+        await repository.connect()
+        await repository.ensure_indexes()
+        startup_errors.pop("database", None)
+    except Exception as e:
+        print(f"Error connecting to the database: {str(e)}")
+        startup_errors["database"] = str(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server starts accepting requests immediately;
+    # the model and the database client are also initialized lazily on first use
+    warmup_tasks = [asyncio.create_task(warm_model()), asyncio.create_task(connect_database())]
+    # Video files left behind by a previous run have no job pointing at them anymore
+    await run_io(video_jobs.remove_stale_files, VIDEO_WORK_DIR, VIDEO_PROCESS_DIR)
+    yield
+    for task in warmup_tasks:
+        task.cancel()
+    await job_queue.stop()
+    scheduler.stop()
+    registry.close()
+    video_jobs.shutdown(wait=False)
+    shutdown_pools(wait=False)
+    await repository.close()
+
+app = FastAPI(title="Image Colorization API", lifespan=lifespan)
+
 
 # Configure CORS
 app.add_middleware(
@@ -33,31 +110,215 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "ETag"],  # Lets the browser read the pagination cursor and validators
 )
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request, exc: PoolSaturatedError):
+    # Backpressure: tell clients to retry instead of queueing work without bound
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against our ETag (weak comparison, as RFC 9110 requires for GET).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def json_with_etag(request: Request, content, headers: Optional[dict] = None) -> Response:
+    """
+    Render content as JSON with a strong ETag from the SHA-256 of the body,
+    or answer 304 without a body if the client already has this version.
+    """
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+    headers = dict(headers or {}, ETag=f'"{hashlib.sha256(body).hexdigest()}"')
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def result_cache_key(image: np.ndarray) -> str:
+    # The colorize mode changes the output, so it is part of the key along with the weights
+    return image_key(image, f"{registry.weights_version}:{COLORIZE_MODE}")
+
+async def store_derivatives(image: np.ndarray, rgb: bool = False) -> dict:
+    """
+    Build the thumbnail and preview of a decoded image and upload them in parallel.
+    Returns {size: url}; sizes the image is too small for are left out.
+    """
+    derivatives = await run_inference(build_derivatives, image, rgb)
+    urls = await asyncio.gather(*(run_io(upload_to_cloudinary, content) for content in derivatives.values()))
+    return dict(zip(derivatives, urls))
+
+async def colorize_and_store(image: np.ndarray, ext: str = ".jpg") -> dict:
+    """
+    Colorize a decoded image, upload the result and its derivatives, and return the document fields
+    (colorized_cloudinary_url and colorized_derivatives).
+    Identical inputs under the same weights reuse the cached colorized bytes without running the model,
+    but are still uploaded as this document's own assets, since other documents may delete theirs.
+    """
+    key = await run_inference(result_cache_key, image)
+    cached = await run_io(result_cache.get, key)
+    if cached and cached.get("content"):
+        colorized_content = cached["content"]
+        colorized_image = await run_inference(cv2.imdecode, np.frombuffer(colorized_content, np.uint8), cv2.IMREAD_COLOR)
+    else:
+        colorized_image = await run_inference(colorize_array, image)
+        # Encode the colorized image in memory
+        colorized_content = await run_inference(encode_image, colorized_image, ext)
+        await run_io(result_cache.put, key, colorized_content)
+    
+    # Upload the colorized image and its derivatives to Cloudinary
+    colorized_cloudinary_url, colorized_derivatives = await asyncio.gather(
+        run_io(upload_to_cloudinary, colorized_content),
+        store_derivatives(colorized_image),
+    )
+    return {"colorized_cloudinary_url": colorized_cloudinary_url, "colorized_derivatives": colorized_derivatives}
+
+def stored_assets(image: dict) -> dict:
+    """
+    Map every stored asset of an image document (original, colorized and their derivatives) to its public ID.
+    """
+    urls = {"original": image.get("cloudinary_url"), "colorized": image.get("colorized_cloudinary_url")}
+    for prefix, field in (("original", "derivatives"), ("colorized", "colorized_derivatives")):
+        for size, url in (image.get(field) or {}).items():
+            urls[f"{prefix}_{size}"] = url
+    public_ids = {}
+    for image_type, url in urls.items():
+        public_id = extract_public_id_from_url(url) if url else None
+        if public_id:
+            public_ids[image_type] = public_id
+    return public_ids
+
 @app.get("/")
 async def root():
     return {"message": "Hello there, This is the Image Colorization API from RhythmGC and his friend, the NHQM group"}
 
-# Get all images
+# Readiness probe
+@app.get("/ready", response_model=dict)
+async def ready():
+    """
+    Report whether the model is loaded and the database is connected.
+    Returns 503 until both are warm.
+    """
+    status = {
+        "model": registry.is_loaded,
+        "database": repository.is_connected,
+        "errors": startup_errors,
+    }
+    if status["model"] and status["database"]:
+        return status
+    return JSONResponse(status_code=503, content=status)
+
+# Get images, one page at a time
 @app.get("/images", response_model=List[dict], status_code=200)
-async def get_images():
+async def get_images(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="_id of the last image of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    colorized: Optional[bool] = Query(None),
+):
     """
-    Get all images from the database.
+    Get images from the database, ordered by ID.
+    The ID to pass as `after` for the next page is returned in the X-Next-Cursor header,
+    which is absent on the last page. Responds 304 when If-None-Match matches the page's ETag.
     """
-    images = get_all_images()
-    return images
+    if after and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {after}")
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    images, next_cursor = await repository.get_images_page(limit, after, field_list, colorized)
+    return json_with_etag(request, images, {"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 # Get image by ID
 @app.get("/images/{image_id}", response_model=dict, status_code=200)
-async def get_image(image_id: str):
+async def get_image(image_id: str, request: Request):
     """
     Get a specific image by its ID.
+    Responds 304 when If-None-Match matches the document's ETag.
     """
-    image = get_image_by_id(image_id)
+    image = await repository.get_image_by_id(image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
+    return json_with_etag(request, image)
+
+def proxy_body(upstream):
+    # Sync generator; StreamingResponse iterates it in a worker thread
+    try:
+        yield from upstream.iter_content(chunk_size=HTTP_CHUNK_SIZE)
+    finally:
+        upstream.close()
+
+async def stream_asset(request: Request, url: str) -> Response:
+    """
+    Stream a stored asset with a strong content-hash ETag, 304 on If-None-Match and Range support.
+    Files on the local disk backend are sent by FileResponse; remote assets are proxied
+    chunk by chunk, forwarding the Range header upstream.
+    """
+    # no-cache: the document may later point at a different asset, so clients revalidate with the ETag
+    headers = {"ETag": f'"{content_hash(url)}"', "Cache-Control": "no-cache", "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = local_asset_path(url)
+    if path:
+        return FileResponse(path, media_type=await run_io(media_type, path), headers=headers)
+
+    upstream_headers = {}
+    if_range = request.headers.get("if-range")
+    if request.headers.get("range") and (if_range is None or if_range == headers["ETag"]):
+        upstream_headers["Range"] = request.headers["range"]
+    try:
+        upstream = await run_io(fetcher.stream, url, upstream_headers)
+    except FetchError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    for header in ("Content-Length", "Content-Range"):
+        if header in upstream.headers:
+            headers[header] = upstream.headers[header]
+    return StreamingResponse(
+        proxy_body(upstream),
+        status_code=upstream.status_code,
+        media_type=upstream.headers.get("Content-Type", "application/octet-stream"),
+        headers=headers,
+    )
+
+async def get_image_for_size(image_id: str, size: str) -> dict:
+    if size not in DERIVATIVE_NAMES:
+        raise HTTPException(status_code=400, detail=f"Invalid size {size}, expected one of: {', '.join(DERIVATIVE_NAMES)}")
+    image = await repository.get_image_by_id(image_id)
     if not image:
         raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
     return image
 
+def sized_url(full_url: str, derivatives: Optional[dict], size: str) -> str:
+    # Images smaller than a derivative size (and documents from before derivatives) fall back to the full image
+    return (derivatives or {}).get(size) or full_url
+
+# Download the original image bytes
+@app.get("/images/{image_id}/original", status_code=200)
+async def get_original_image(image_id: str, request: Request, size: str = Query("full", description="thumbnail, preview or full")):
+    """
+    Stream the original image at the requested size. Supports Range requests and If-None-Match.
+    """
+    image = await get_image_for_size(image_id, size)
+    if not image.get("cloudinary_url"):
+        raise HTTPException(status_code=404, detail=f"Image with ID {image_id} has no stored original")
+    return await stream_asset(request, sized_url(image["cloudinary_url"], image.get("derivatives"), size))
+
+# Download the colorized image bytes
+@app.get("/images/{image_id}/colorized", status_code=200)
+async def get_colorized_image(image_id: str, request: Request, size: str = Query("full", description="thumbnail, preview or full")):
+    """
+    Stream the colorized image at the requested size. Supports Range requests and If-None-Match.
+    """
+    image = await get_image_for_size(image_id, size)
+    if not image.get("colorized_cloudinary_url"):
+        raise HTTPException(status_code=404, detail=f"Image with ID {image_id} is not colorized")
+    return await stream_asset(request, sized_url(image["colorized_cloudinary_url"], image.get("colorized_derivatives"), size))
+
 # Create a new image
 @app.post("/images", response_model=dict, status_code=201)
 async def create_new_image(image: ImageCreate = Body(...)):
@@ -65,7 +326,7 @@ async def create_new_image(image: ImageCreate = Body(...)):
     Create a new image entry in the database.
     """
     image_data = image.dict()
-    created_image = create_image(image_data)
+    created_image = await repository.create_image(image_data)
     return created_image
 
 # Create a new image with file upload
@@ -90,72 +351,55 @@ async def upload_image(
             # Remove file extension to get cleaner title
             title = os.path.splitext(file.filename)[0]
         
-        # Create a temporary file for Cloudinary upload
-        temp_file = f"temp_{file.filename}"
-        with open(temp_file, "wb") as f:
-            f.write(content)
-        
-        # Upload image to Cloudinary
-        cloudinary_url = upload_to_cloudinary(temp_file)
-        
-        
-        # Create image entry in database
         image_data = {
             "title": title,
             "description": description,
-            "cloudinary_url": cloudinary_url,
             "colorized": False
         }
         
+        # Decode once: the same pixels feed the derivatives and, with auto_colorize, the model
+        try:
+            decoded_image = await run_inference(decode_image, content)
+        except PoolSaturatedError:
+            raise
+        except Exception as e:
+            print(f"Could not decode {file.filename}, storing it without derivatives: {str(e)}")
+            decoded_image = None
+        
+        # Upload the original while building its derivatives and colorizing the uploaded bytes
+        tasks = [run_io(upload_to_cloudinary, content)]
+        if decoded_image is not None:
+            tasks.append(store_derivatives(decoded_image, rgb=True))
+            if auto_colorize:
+                tasks.append(colorize_and_store(decoded_image, image_extension(file.filename)))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if isinstance(results[0], BaseException):
+            raise results[0]
+        cloudinary_url = results[0]
+        if len(results) > 1:
+            if isinstance(results[1], BaseException):
+                print(f"Error building derivatives: {str(results[1])}")
+            else:
+                image_data["derivatives"] = results[1]
+        if len(results) > 2:
+            if isinstance(results[2], BaseException):
+                # If colorization fails, save the original image only
+                print(f"Error in auto-colorizing: {str(results[2])}")
+            else:
+                image_data.update(colorized=True, **results[2])
+        image_data["cloudinary_url"] = cloudinary_url
+        
+        # Create image entry in database
         print(f"Attempting to save to database: {image_data}")
-        created_image = create_image(image_data)
+        created_image = await repository.create_image(image_data)
         print(f"Database response: {created_image}")
         
-        # If auto_colorize is True, colorize the image
-        if auto_colorize and created_image:
-            try:
-                # Colorize the image
-                colorized_image = Gen_Image(cloudinary_url)
-                
-                # Save colorized image to a temporary file
-                colorized_temp_file = f"temp_colorized_{file.filename}"
-                cv2.imwrite(colorized_temp_file, colorized_image * 255)  # Convert normalized image back to 0-255 range
-                
-                # Upload colorized image to Cloudinary
-                colorized_cloudinary_url = upload_to_cloudinary(colorized_temp_file)
-                
-                # Update image entry with colorized information
-                update_data = {
-                    "colorized": True,
-                    "colorized_cloudinary_url": colorized_cloudinary_url
-                }
-                
-                updated_image = update_image(created_image["_id"], update_data)
-                
-                # Clean up colorized temporary file
-                if os.path.exists(colorized_temp_file):
-                    os.remove(colorized_temp_file)
-                
-                # Remove the original temporary file after everything is done
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                
-                return updated_image
-            except Exception as e:
-                print(f"Error in auto-colorizing: {str(e)}")
-                # If colorization fails, return the original image
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                return created_image
-        
-        # Remove the temporary file
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        
         if created_image:
             return created_image
         else:
             raise HTTPException(status_code=500, detail="Failed to save image to database")
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         print(f"Error in upload_image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
@@ -166,11 +410,10 @@ async def update_existing_image(image_id: str, image_data: dict = Body(...)):
     """
     Update an existing image by ID.
     """
-    image = get_image_by_id(image_id)
-    if not image:
+    # The existence check is folded into the atomic find-and-update
+    updated_image = await repository.update_image(image_id, image_data)
+    if not updated_image:
         raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
-    
-    updated_image = update_image(image_id, image_data)
     return updated_image
 
 # Delete an image
@@ -179,41 +422,64 @@ async def delete_existing_image(image_id: str):
     """
     Delete an image by ID from both database and Cloudinary storage.
     """
-    image = get_image_by_id(image_id)
+    # Delete from database first; the deleted document tells us which assets to clean up
+    image = await repository.delete_image(image_id)
     if not image:
         raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
     
-    cloudinary_deletion_results = []
+    # Delete the original, the colorized image and their derivatives in one bulk call
+    public_ids = stored_assets(image)
+    deleted = await run_io(delete_images_from_cloudinary, list(public_ids.values())) if public_ids else {}
+    cloudinary_deletion_results = [
+        {"image_type": image_type, "success": deleted.get(public_id, False)}
+        for image_type, public_id in public_ids.items()
+    ]
     
-    # Delete original image from Cloudinary if URL exists
-    if image.get("cloudinary_url"):
-        public_id = extract_public_id_from_url(image["cloudinary_url"])
-        if public_id:
-            original_deleted = delete_image_from_cloudinary(public_id)
-            cloudinary_deletion_results.append({
-                "image_type": "original",
-                "success": original_deleted
-            })
+    return {
+        "message": f"Image with ID {image_id} deleted successfully",
+        "cloudinary_results": cloudinary_deletion_results
+    }
+
+async def colorize_stored_image(image: dict) -> dict:
+    """
+    Download and colorize a stored image document and return the fields to update.
+    If the document has no derivatives of its original yet, they are built from the same decode.
+    """
+    if not image.get("cloudinary_url"):
+        raise ValueError("Image doesn't have a valid Cloudinary URL")
     
-    # Delete colorized image from Cloudinary if URL exists
-    if image.get("colorized_cloudinary_url"):
-        colorized_public_id = extract_public_id_from_url(image["colorized_cloudinary_url"])
-        if colorized_public_id:
-            colorized_deleted = delete_image_from_cloudinary(colorized_public_id)
-            cloudinary_deletion_results.append({
-                "image_type": "colorized",
-                "success": colorized_deleted
-            })
+    # Download and decode the original, then colorize it (or reuse a cached result)
+    content = await run_io(retrive_image, image["cloudinary_url"])
+    decoded_image = await run_inference(decode_image, content)
+    if "derivatives" in image:
+        return {"colorized": True, **await colorize_and_store(decoded_image, ".jpg")}
+    colorized, derivatives = await asyncio.gather(
+        colorize_and_store(decoded_image, ".jpg"),
+        store_derivatives(decoded_image, rgb=True),
+    )
+    return {"colorized": True, **colorized, "derivatives": derivatives}
+
+async def colorize_existing_image(image_id: str) -> dict:
+    """
+    Download a stored image, colorize it (or reuse a cached result) and save the colorized URL.
+    Raises LookupError if the image doesn't exist and ValueError if it has no Cloudinary URL.
+    Shared by the synchronous endpoint and the colorize job handler.
+    """
+    image = await repository.get_image_by_id(image_id)
+    if not image:
+        raise LookupError(f"Image with ID {image_id} not found")
     
-    # Delete from database
-    success = delete_image(image_id)
-    if success:
-        return {
-            "message": f"Image with ID {image_id} deleted successfully",
-            "cloudinary_results": cloudinary_deletion_results
-        }
-    else:
-        raise HTTPException(status_code=500, detail="Failed to delete image from database")
+    update_data = await colorize_stored_image(image)
+    updated_image = await repository.update_image(image_id, update_data)
+    if not updated_image:
+        raise LookupError(f"Image with ID {image_id} was deleted during colorization")
+    return updated_image
+
+async def run_colorize_job(payload: dict) -> dict:
+    updated_image = await colorize_existing_image(payload["image_id"])
+    return {"image_id": updated_image["_id"], "colorized_cloudinary_url": updated_image["colorized_cloudinary_url"]}
+
+job_queue.register("colorize", run_colorize_job)
 
 # Colorize an existing image
 @app.post("/images/{image_id}/colorize", response_model=dict, status_code=200)
@@ -221,51 +487,173 @@ async def colorize_image(image_id: str):
     """
     Colorize an existing image using the ML model and save the result to Cloudinary.
     """
-    image = get_image_by_id(image_id)
-    if not image:
-        raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
-    
-    if not image.get("cloudinary_url"):
-        raise HTTPException(status_code=400, detail="Image doesn't have a valid Cloudinary URL")
-    
     try:
-        # Get the cloudinary URL from the existing image
-        cloudinary_url = image["cloudinary_url"]
-        
-        # Colorize the image
-        colorized_image = Gen_Image(cloudinary_url)
-        
-        # Generate a temporary filename
-        temp_filename = f"temp_colorized_{image_id}.jpg"
-        
-        # Save colorized image to a temporary file
-        cv2.imwrite(temp_filename, colorized_image * 255)  # Convert normalized image back to 0-255 range
-        
-        # Upload to Cloudinary
-        colorized_cloudinary_url = upload_to_cloudinary(temp_filename)
-        
-        # Remove the temporary file
-        os.remove(temp_filename)
-        
-        update_data = {
-            "colorized": True,
-            "colorized_cloudinary_url": colorized_cloudinary_url
-        }
-        
-        updated_image = update_image(image_id, update_data)
-        return updated_image
+        return await colorize_existing_image(image_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         print(f"Error in colorize_image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error colorizing image: {str(e)}")
 
+# Queue the colorization of an existing image
+@app.post("/images/{image_id}/colorize/jobs", response_model=dict, status_code=202)
+async def enqueue_colorize_image(image_id: str):
+    """
+    Queue the colorization of an existing image and return immediately with a job ID.
+    Poll GET /jobs/{job_id} or stream GET /jobs/{job_id}/events for the result.
+    """
+    if not ObjectId.is_valid(image_id):
+        raise HTTPException(status_code=400, detail=f"Invalid image ID: {image_id}")
+    try:
+        return await job_queue.enqueue("colorize", {"image_id": image_id})
+    except Exception as e:
+        print(f"Error in enqueue_colorize_image: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing colorization: {str(e)}")
+
+class BulkColorizeRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    filter: Optional[dict] = None
+    limit: int = BULK_COLORIZE_MAX_IMAGES
+
+# Fields a bulk filter may match on, and the value types each accepts
+BULK_FILTER_FIELDS = {"colorized": (bool,), "title": (str,), "description": (str, type(None))}
+# Comparison operators a bulk filter may use; $in and $nin take a list of values
+BULK_FILTER_OPERATORS = {"$eq", "$ne", "$in", "$nin"}
+
+def build_bulk_filter(filter: dict) -> dict:
+    """
+    Turn a client-supplied bulk filter into a MongoDB query, allowing only plain comparisons
+    on BULK_FILTER_FIELDS. Anything else ($where, $expr, $regex, unknown fields...) is a 400.
+    """
+    query = {}
+    for field, condition in filter.items():
+        types = BULK_FILTER_FIELDS.get(field)
+        if types is None:
+            raise HTTPException(status_code=400, detail=f"Cannot filter on {field}; allowed fields: "
+                                                        f"{', '.join(BULK_FILTER_FIELDS)}")
+        conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+        for operator, value in conditions.items():
+            if operator not in BULK_FILTER_OPERATORS:
+                raise HTTPException(status_code=400, detail=f"Operator {operator} is not allowed on {field}; "
+                                                            f"allowed operators: {', '.join(sorted(BULK_FILTER_OPERATORS))}")
+            values = value if operator in ("$in", "$nin") else [value]
+            if not isinstance(values, list) or not all(isinstance(v, types) for v in values):
+                raise HTTPException(status_code=400, detail=f"Invalid value for {field} {operator}")
+        query[field] = dict(conditions)
+    return query
+
+async def bulk_colorize_events(images: List[dict], missing_ids: List[str]):
+    """
+    Colorize many images and yield one NDJSON line per image as it finishes, then a summary line.
+    Downloads, forward passes and uploads for up to BULK_COLORIZE_CONCURRENCY images overlap;
+    the batch scheduler groups the concurrent forward passes into batched Generator calls.
+    Database updates are written with bulk_write every BULK_COLORIZE_WRITE_BATCH images, and whatever
+    is left when the stream ends (even if the client disconnects) is written before returning.
+    """
+    semaphore = asyncio.Semaphore(BULK_COLORIZE_CONCURRENCY)
+    total = len(images) + len(missing_ids)
+    done = 0
+    colorized = 0
+    modified = 0
+    pending = {}
+    failed = len(missing_ids)
+
+    async def colorize_one(image: dict):
+        async with semaphore:
+            # A saturated pool is a temporary condition: back off and try again instead of failing the image
+            delay = BULK_COLORIZE_RETRY_BASE_SECONDS
+            deadline = time.monotonic() + BULK_COLORIZE_SATURATED_WAIT_SECONDS
+            while True:
+                try:
+                    update_data = await colorize_stored_image(image)
+                    break
+                except PoolSaturatedError as e:
+                    if time.monotonic() + delay > deadline:
+                        print(f"Error colorizing image {image['_id']}: {str(e)}")
+                        return image["_id"], None, str(e)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+                except Exception as e:
+                    print(f"Error colorizing image {image['_id']}: {str(e)}")
+                    return image["_id"], None, str(e)
+            # Recorded here rather than by the consumer so finished uploads are saved even if nobody reads the event
+            pending[image["_id"]] = update_data
+            return image["_id"], update_data, None
+
+    def flush():
+        # Shielded so a write that has started completes even when the stream itself is being cancelled
+        updates = dict(pending)
+        pending.clear()
+        return asyncio.shield(repository.update_images(updates))
+
+    for image_id in missing_ids:
+        done += 1
+        yield json.dumps({"image_id": image_id, "status": "failed", "error": "Image not found",
+                          "done": done, "total": total}) + "\n"
+
+    tasks = [asyncio.create_task(colorize_one(image)) for image in images]
+    try:
+        for task in asyncio.as_completed(tasks):
+            image_id, update_data, error = await task
+            done += 1
+            event = {"image_id": image_id, "done": done, "total": total}
+            if error:
+                failed += 1
+                event.update(status="failed", error=error)
+            else:
+                colorized += 1
+                event.update(status="colorized", colorized_cloudinary_url=update_data["colorized_cloudinary_url"])
+            if len(pending) >= BULK_COLORIZE_WRITE_BATCH:
+                modified += await flush()
+            yield json.dumps(event) + "\n"
+    finally:
+        # Stop outstanding work if the client goes away, but keep the results that already finished
+        for task in tasks:
+            task.cancel()
+        if pending:
+            modified += await flush()
+
+    yield json.dumps({"status": "finished", "total": total, "colorized": colorized,
+                      "failed": failed, "updated": modified}) + "\n"
+
+# Colorize many images in one call
+@app.post("/images/colorize/bulk", status_code=200)
+async def bulk_colorize(request: BulkColorizeRequest = Body(...)):
+    """
+    Colorize a list of images (`ids`) or every image matching a `filter` on colorized, title or description,
+    e.g. {"filter": {"colorized": false}} or {"filter": {"title": {"$in": ["a", "b"]}}}.
+    Progress is streamed back as newline-delimited JSON.
+    """
+    if not request.ids and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide either ids or a filter")
+    query = build_bulk_filter(request.filter) if not request.ids else None
+    limit = max(1, min(request.limit, BULK_COLORIZE_MAX_IMAGES))
+    fields = ["cloudinary_url", "derivatives"]
+    missing_ids = []
+    if request.ids:
+        invalid_ids = [image_id for image_id in request.ids if not ObjectId.is_valid(image_id)]
+        if invalid_ids:
+            raise HTTPException(status_code=400, detail=f"Invalid image IDs: {', '.join(invalid_ids)}")
+        requested_ids = list(dict.fromkeys(request.ids))[:limit]
+        images = await repository.find_images({"_id": {"$in": [ObjectId(image_id) for image_id in requested_ids]}}, fields)
+        found_ids = {image["_id"] for image in images}
+        missing_ids = [image_id for image_id in requested_ids if image_id not in found_ids]
+    else:
+        images = await repository.find_images(query, fields, limit)
+    print(f"Bulk colorizing {len(images)} images")
+    return StreamingResponse(bulk_colorize_events(images, missing_ids), media_type="application/x-ndjson")
+
 # Mark an image as colorized
 @app.put("/images/{image_id}/colorize", response_model=dict, status_code=200)
 async def mark_as_colorized(image_id: str, colorized_image: UploadFile = File(...)):
     """
     Mark an image as colorized and upload the colorized image to Cloudinary.
     """
-    image = get_image_by_id(image_id)
-    if not image:
+    if not ObjectId.is_valid(image_id):
         raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
     
     # Upload colorized image to Cloudinary
@@ -273,24 +661,27 @@ async def mark_as_colorized(image_id: str, colorized_image: UploadFile = File(..
         # Read the uploaded colorized image
         content = await colorized_image.read()
         
-        # Create a temporary file for Cloudinary upload
-        temp_file = f"temp_colorized_{colorized_image.filename}"
-        with open(temp_file, "wb") as f:
-            f.write(content)
-        
-        # Upload to Cloudinary
-        colorized_cloudinary_url = upload_to_cloudinary(temp_file)
-        
-        # Remove the temporary file
-        os.remove(temp_file)
+        # Upload to Cloudinary along with the derivatives
+        decoded_image = await run_inference(decode_image, content)
+        colorized_cloudinary_url, colorized_derivatives = await asyncio.gather(
+            run_io(upload_to_cloudinary, content),
+            store_derivatives(decoded_image, rgb=True),
+        )
         
         update_data = {
             "colorized": True,
-            "colorized_cloudinary_url": colorized_cloudinary_url
+            "colorized_cloudinary_url": colorized_cloudinary_url,
+            "colorized_derivatives": colorized_derivatives
         }
         
-        updated_image = update_image(image_id, update_data)
+        # The existence check is folded into the update; drop the uploads if the image is gone
+        updated_image = await repository.update_image(image_id, update_data)
+        if not updated_image:
+            await run_io(delete_images_from_cloudinary, list(stored_assets(update_data).values()))
+            raise HTTPException(status_code=404, detail=f"Image with ID {image_id} not found")
         return updated_image
+    except (PoolSaturatedError, HTTPException):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading colorized image: {str(e)}")
 
@@ -312,53 +703,213 @@ async def upload_and_colorize(
         if title is None:
             title = os.path.splitext(file.filename)[0]
         
-        # Create a temporary file for Cloudinary upload
-        temp_file = f"temp_{file.filename}"
-        with open(temp_file, "wb") as f:
-            f.write(content)
-        
-        # Upload original image to Cloudinary
-        cloudinary_url = upload_to_cloudinary(temp_file)
+        # Upload the original to Cloudinary while colorizing the uploaded bytes from memory
+        decoded_image = await run_inference(decode_image, content)
+        cloudinary_url, derivatives, colorized = await asyncio.gather(
+            run_io(upload_to_cloudinary, content),
+            store_derivatives(decoded_image, rgb=True),
+            colorize_and_store(decoded_image, image_extension(file.filename)),
+        )
         
-        # Create image entry in database
+        # All URLs are known, so the entry is created already colorized in a single insert
         image_data = {
             "title": title,
             "description": description,
             "cloudinary_url": cloudinary_url,
-            "colorized": False
-        }
-        
-        created_image = create_image(image_data)
-        
-        # Colorize the image
-        colorized_image = Gen_Image(cloudinary_url)
-        
-        # Save colorized image to a temporary file
-        colorized_temp_file = f"temp_colorized_{file.filename}"
-        cv2.imwrite(colorized_temp_file, colorized_image * 255)  # Convert normalized image back to 0-255 range
-        
-        # Upload colorized image to Cloudinary
-        colorized_cloudinary_url = upload_to_cloudinary(colorized_temp_file)
-        
-        # Update image entry with colorized information
-        update_data = {
+            "derivatives": derivatives,
             "colorized": True,
-            "colorized_cloudinary_url": colorized_cloudinary_url
+            **colorized
         }
         
-        updated_image = update_image(created_image["_id"], update_data)
-        
-        # Clean up temporary files
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        if os.path.exists(colorized_temp_file):
-            os.remove(colorized_temp_file)
-        
-        return updated_image
+        created_image = await repository.create_image(image_data)
+        if not created_image:
+            raise HTTPException(status_code=500, detail="Failed to save image to database")
+        return created_image
         
+    except (PoolSaturatedError, HTTPException):
+        raise
     except Exception as e:
         print(f"Error in upload_and_colorize: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing upload and colorization: {str(e)}")
 
+def save_upload(upload: UploadFile, path: str):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, length=1024 * 1024)
+
+# Colorize a video in the background
+@app.post("/videos/colorize", response_model=dict, status_code=202)
+async def colorize_video(file: UploadFile = File(...)):
+    """
+    Upload a video and start a background job that colorizes it frame by frame.
+    Poll GET /videos/jobs/{job_id} for progress and download the result when it is completed.
+    """
+    try:
+        os.makedirs(VIDEO_PROCESS_DIR, exist_ok=True)
+        name = uuid.uuid4().hex
+        input_path = os.path.join(VIDEO_PROCESS_DIR, f"{name}_input{os.path.splitext(file.filename or '')[1] or '.mp4'}")
+        output_path = os.path.join(VIDEO_PROCESS_DIR, f"{name}_colorized.mp4")
+        # Stream the upload to disk since cv2.VideoCapture needs a file path
+        await run_io(save_upload, file, input_path)
+        return video_jobs.submit(input_path, output_path)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        print(f"Error in colorize_video: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error starting video colorization: {str(e)}")
+
+# Get the status of a video job
+@app.get("/videos/jobs/{job_id}", response_model=dict, status_code=200)
+async def get_video_job(job_id: str):
+    """
+    Get the status and progress of a video colorization job.
+    """
+    job = video_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Video job with ID {job_id} not found")
+    return job
+
+# Download the colorized video
+@app.get("/videos/jobs/{job_id}/result", status_code=200)
+async def get_video_job_result(job_id: str):
+    """
+    Download the colorized video of a completed job.
+    """
+    job = video_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Video job with ID {job_id} not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Video job {job_id} is {job['status']}")
+    if not os.path.exists(job["output_path"]):
+        raise HTTPException(status_code=410, detail=f"The output of video job {job_id} has been removed")
+    return FileResponse(job["output_path"], media_type="video/mp4", filename=f"{job_id}.mp4")
+
+# Serve an asset from the local disk storage backend
+@app.get("/storage/{public_id:path}", status_code=200)
+async def get_stored_asset(public_id: str):
+    """
+    Serve an image stored by the "disk" storage backend.
+    Stored files are content-addressed and never change, so clients may cache them forever.
+    """
+    path = stored_file(public_id)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"Asset {public_id} not found")
+    return FileResponse(
+        path,
+        media_type=await run_io(media_type, path),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+# Get the status of a colorization job
+@app.get("/jobs/{job_id}", response_model=dict, status_code=200)
+async def get_job(job_id: str):
+    """
+    Get the status, attempts, result or last error of a queued job.
+    """
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+    return job
+
+# Stream job status changes
+@app.get("/jobs/{job_id}/events", status_code=200)
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream that emits the job document whenever its status changes
+    and closes once the job is completed or dead-lettered.
+    """
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+
+    async def events():
+        current = job
+        last_seen = None
+        while current:
+            if (current["status"], current["attempts"]) != last_seen:
+                last_seen = (current["status"], current["attempts"])
+                yield f"event: {current['status']}\ndata: {json.dumps(jsonable_encoder(current))}\n\n"
+            if current["status"] in TERMINAL_STATES:
+                break
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = await job_queue.get(job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Retry a dead-lettered job
+@app.post("/jobs/{job_id}/retry", response_model=dict, status_code=202)
+async def retry_job(job_id: str):
+    """
+    Put a dead-lettered job back in the queue.
+    """
+    job = await job_queue.retry(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"No dead-lettered job with ID {job_id}")
+    return job
+
+# Execution pool metrics
+@app.get("/metrics/pools", response_model=dict, status_code=200)
+async def get_pool_metrics():
+    """
+    Get in-flight, completed and rejected task counts for the inference and I/O pools,
+    the CPU set and batch count of each inference worker process, and their frame ring's slot usage.
+    """
+    stats = pool_stats()
+    stats["inference_workers"] = registry.worker_stats()
+    return stats
+
+# Result cache metrics
+@app.get("/metrics/cache", response_model=dict, status_code=200)
+async def get_cache_metrics():
+    """
+    Get hit, miss and eviction counters for the colorized result cache.
+    """
+    return result_cache.stats()
+
+# Batching metrics
+@app.get("/metrics/batching", response_model=dict, status_code=200)
+async def get_batching_metrics():
+    """
+    Get batch fill ratio and queue latency statistics for the inference scheduler.
+    """
+    return scheduler.metrics()
+
+def resolve_weights(name: str) -> str:
+    """
+    Map a weights name from a reload request to a path inside MODEL_WEIGHTS_DIR.
+    Anything that isn't a plain entry of that directory (paths, "..", symlinks out of it) is rejected.
+    """
+    if not name or name in (".", "..") or os.path.basename(name) != name:
+        raise HTTPException(status_code=400, detail="weights must be a file name inside the weights directory")
+    path = os.path.realpath(os.path.join(MODEL_WEIGHTS_DIR, name))
+    if os.path.dirname(path) != MODEL_WEIGHTS_DIR:
+        raise HTTPException(status_code=400, detail="weights must be a file name inside the weights directory")
+    return path
+
+# Reload the model weights without restarting the server (admin only, not part of the public API)
+@app.post("/model/reload", response_model=dict, status_code=200, include_in_schema=False)
+async def reload_model(weights: Optional[str] = Body(None, embed=True),
+                       x_admin_token: Optional[str] = Header(None)):
+    """
+    Rebuild the generator from a weights file in MODEL_WEIGHTS_DIR and swap it in for new requests.
+    If no weights name is provided, the current weights file is reloaded.
+    """
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Model reload requires a valid admin token")
+    weights_path = resolve_weights(weights) if weights else None
+    try:
+        version = await run_inference(registry.reload, weights_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Weights {weights} not found")
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        print(f"Error in reload_model: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error reloading model")
+    return {
+        "message": "Model reloaded successfully",
+        "weights": os.path.basename(registry.weights_path),
+        "version": version
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)